@@ -1,4 +1,4 @@
-from .models.email_data import Email
+from .models.email_data import Email, Attachment
 from .core.env_handler import EnvHandler
 from .models.user_model import UserModel
 from .core.email_handler import EmailHandler
@@ -15,6 +15,7 @@ __all__ = [
     "EnvHandler", 
     "UserModel", 
     "Email",
+    "Attachment",
     "Path",
     "is_valid_email_in",
     "parse_message",
@@ -2,29 +2,60 @@
 agrupa classes responsáveis por manipular o envio e recebimento de e-mails.
 """
 
-import json
+import os
+import mmap
+import socket
+import functools
+import itertools
+import threading
 import asyncio
 import hashlib
 import smtplib
-import mimetypes
+import binascii
+import tempfile
 import email as _email
 from aiosmtpd.smtp import Envelope
+from email import policy
 from email.message import EmailMessage
+from email.parser import BytesHeaderParser
 from aiosmtpd.controller import Controller
-from email.utils import formatdate
-from typing import Optional, overload, AsyncGenerator, Literal
+from email.generator import BytesGenerator
+from email.contentmanager import ContentManager, raw_data_manager, set_bytes_content
+from email.utils import formatdate, getaddresses
+from collections import deque
+from typing import Optional, overload, AsyncGenerator, Literal, BinaryIO
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from .env_handler import EnvHandler
-from ..models.email_data import Email
+from ..models.email_data import Email, Attachment
 from ..exceptions import *
 from .utils import (
     Path,
     Report,
     parse_message, 
+    iter_payload,
+    AttachmentSpool,
+    dump_json,
+    guess_type,
+    guess_extension,
     get_email_hash,
 )
 from .messeger import (
-    WAIT_EMAIL_COOLDOWN,
+    SEND_CONNECTIONS,
+    SAVE_BATCH_SIZE,
+    SAVE_BATCH_DELAY,
+    ATTACHMENT_SPOOL_SIZE,
+    WRITEV_BUFFERS,
+    PAYLOAD_CHUNK_SIZE,
+    RECEIVER_WORKERS,
+    MAX_RECEIVED_EMAILS,
+    MAX_DESTINATION_NAME,
+    HEADER_CACHE_SIZE,
+    TRIGGER_ATTEMPTS,
     RECEIVER_OFF,
     PATH_ARE_NOT_DEFINED,
     PATH_NOT_FOUND,
@@ -33,75 +64,566 @@ from .messeger import (
     STATUS_500,
     TIMEOUT,
     UNEXPECTED_TYPE,
-    INVALID_EXTENSION
+    INVALID_EXTENSION,
+    INVALID_WORKERS,
+    INVALID_CONNECTIONS,
+    INVALID_MAX_EMAILS,
+    SAVE_FAILED,
+    TRIGGER_FAILED
 )
 
 
+@functools.lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _header(name: str, value: Optional[str]):
+    # cabeçalhos interpretados pela política padrão são imutáveis, então são reaproveitados entre mensagens (remetentes, assuntos, ...)
+    return policy.default.header_factory(name, value)
+
+
+def _set_text_content(message: EmailMessage, content: Optional[str]):
+    # textos ASCII com linhas curtas sempre resultam em "7bit": os mesmos cabeçalhos e corpo de set_content, sem escolher a codificação a cada envio
+    if isinstance(content, str) and content.isascii():
+        lines = content.encode("ascii").splitlines()
+        if max(map(len, lines), default=0) <= message.policy.max_line_length:
+            message["Content-Type"] = _header("Content-Type", 'text/plain; charset="utf-8"')
+            message["Content-Transfer-Encoding"] = _header("Content-Transfer-Encoding", "7bit")
+            message["MIME-Version"] = _header("MIME-Version", "1.0")
+            message.set_payload((b"\n".join(lines) + b"\n").decode("ascii"))
+            return
+
+    message.set_content(content)
+
+
+def _addresses(destination: str|list[str]) -> str:
+    return ", ".join(destination) if isinstance(destination, list) else destination
+
+
+def _destination_name(destination: str|list[str]) -> str:
+    # o caso comum (um único destinatário) usa o endereço diretamente, sem concatenar a lista
+    if isinstance(destination, list) and len(destination) == 1:
+        destination = destination[0]
+
+    name = destination if isinstance(destination, str) else "".join(destination)
+    if len(name) <= MAX_DESTINATION_NAME:
+        return name
+
+    # muitos destinatários geram nomes maiores que o permitido pelo sistema de arquivos, então são abreviados com um hash
+    addresses = destination if isinstance(destination, list) else [destination]
+    digest = hashlib.blake2b("\0".join(sorted(addresses)).encode(), digest_size=12).hexdigest()
+    return f"{name[:MAX_DESTINATION_NAME - len(digest) - 1]}_{digest}"
+
+
+def _free_name(name: str, used: set[str], ext: str="") -> str:
+    # mesmo esquema de Path.free_name ("nome", "nome_2", "nome_3", ...), mas consultando um conjunto em vez do sistema de arquivos
+    candidate = name + ext
+    counter = 2
+    while candidate in used:
+        candidate = Path(f"{name}_{counter}{ext}").parser(full=False).name
+        counter += 1
+
+    used.add(candidate)
+    return candidate
+
+
+def _copy_file(source: AttachmentSpool, fd: int) -> bool:
+    # copia um anexo guardado em arquivo temporário direto para o destino com os.sendfile, sem passar pelo espaço do usuário
+    if not hasattr(os, "sendfile") or not isinstance(source, AttachmentSpool):
+        return False
+
+    with source.open() as file:
+        source_fd = file.fileno()
+        size = os.fstat(source_fd).st_size
+        offset = 0
+        while offset < size:
+            try:
+                sent = os.sendfile(fd, source_fd, offset, size - offset)
+            except OSError:
+                # sistemas que não suportam sendfile entre arquivos: volta à cópia em blocos, do início
+                if offset == 0:
+                    return False
+                raise
+            if sent == 0:
+                break
+            offset += sent
+
+    return True
+
+
+def _open_file(path: str) -> int:
+    # abre diretamente pelo descritor, sem a verificação de existência e o buffer de Path.file (os arquivos são sempre novos)
+    return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+
+def _write_file(path: str, buffers: list[bytes|memoryview]):
+    fd = _open_file(path)
+    try:
+        _write_buffers(fd, buffers)
+    finally:
+        os.close(fd)
+
+
+def _write_buffers(fd: int, buffers: list[bytes|memoryview]):
+    # escreve vários blocos com uma única chamada de sistema (quando os.writev está disponível)
+    if not hasattr(os, "writev"):
+        for buffer in buffers:
+            view = memoryview(buffer)
+            while view:
+                view = view[os.write(fd, view):]
+        return
+
+    buffers = list(buffers)
+    while buffers:
+        written = os.writev(fd, buffers)
+
+        while buffers and written >= len(buffers[0]):
+            written -= len(buffers[0])
+            buffers.pop(0)
+
+        if buffers and written:
+            buffers[0] = memoryview(buffers[0])[written:]
+
+
+class _DataWriter:
+    # recebe a mensagem gerada por BytesGenerator e envia-a ao socket em blocos, aplicando o "dot-stuffing" do comando DATA
+    __slots__ = ["_sock", "_buffer", "_at_line_start"]
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._buffer = bytearray()
+        self._at_line_start = True
+
+
+    def write(self, data: bytes|str):
+        if not data:
+            return
+        if isinstance(data, str):
+            data = data.encode("ascii", "surrogateescape")
+        
+        data = data.replace(b"\n.", b"\n..")
+        if self._at_line_start and data.startswith(b"."):
+            data = b"." + data
+        self._at_line_start = data.endswith(b"\n")
+
+        self._buffer += data
+        if len(self._buffer) >= PAYLOAD_CHUNK_SIZE:
+            self.flush()
+
+
+    def flush(self):
+        if self._buffer:
+            self._sock.sendall(self._buffer)
+            self._buffer.clear()
+
+
+    def close(self):
+        if not self._at_line_start:
+            self._buffer += b"\r\n"
+        self._buffer += b".\r\n"
+        self.flush()
+
+
+# mesmo gerenciador padrão do EmailMessage, mas aceitando anexos mapeados em memória (mmap)
+_attachment_manager = ContentManager()
+_attachment_manager.get_handlers.update(raw_data_manager.get_handlers)
+_attachment_manager.set_handlers.update(raw_data_manager.set_handlers)
+_attachment_manager.add_set_handler(mmap.mmap, set_bytes_content)
+
+
+def _stream_message(smtp: smtplib.SMTP, message: EmailMessage, from_addr: Optional[str]=None, to_addrs: Optional[str|list[str]]=None):
+    # equivalente a smtp.send_message, mas gera a mensagem diretamente no socket, sem montá-la inteira na memória
+    if from_addr is None:
+        from_addr = getaddresses([message["From"]])[0][1]
+    if to_addrs is None:
+        to_addrs = [addr for _, addr in getaddresses(message.get_all("To", []) + message.get_all("Cc", []))]
+    elif isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+
+    smtp.ehlo_or_helo_if_needed()
+
+    code, resp = smtp.mail(from_addr)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+    
+    refused = {}
+    for addr in to_addrs:
+        code, resp = smtp.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    if len(refused) == len(to_addrs):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+    
+    smtp.putcmd("data")
+    code, resp = smtp.getreply()
+    if code != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, resp)
+    
+    try:
+        writer = _DataWriter(smtp.sock)
+        BytesGenerator(writer, policy=message.policy.clone(linesep="\r\n")).flatten(message)
+        writer.close()
+    except BaseException:
+        # o servidor continua aguardando o fim do DATA: a conexão não pode mais ser reaproveitada
+        smtp.close()
+        raise
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    
+    return refused
+
+
+def _split_head(data: bytes) -> tuple[bytes, bytes]:
+    # separa o bloco de cabeçalhos do corpo na primeira linha em branco, sem que o parser percorra o corpo
+    crlf = data.find(b"\r\n\r\n")
+    lf = data.find(b"\n\n")
+    if crlf == -1 and lf == -1:
+        return data, b""
+    if lf == -1 or (crlf != -1 and crlf < lf):
+        return data[:crlf + 2], data[crlf + 4:]
+    return data[:lf + 1], data[lf + 2:]
+
+
+def _parse_headers(data: bytes) -> tuple[str, str]:
+    # somente os cabeçalhos são interpretados na recepção, o corpo fica para _parse_body
+    headers = BytesHeaderParser().parsebytes(_split_head(data)[0])
+    return headers["Date"], headers["Subject"].strip()
+
+
+def _new_spool() -> tuple[BinaryIO, AttachmentSpool]:
+    # o arquivo temporário é fechado após a escrita e reaberto sob demanda (e-mails mantidos em memória não seguram descritores)
+    fd, path = tempfile.mkstemp(prefix="tempemail_")
+    return os.fdopen(fd, "wb"), AttachmentSpool(path)
+
+
+def _spool_base64(encoded: str) -> Optional[tuple[AttachmentSpool, str]]:
+    # decodifica o base64 em blocos direto para o arquivo temporário, calculando o hash no mesmo passo
+    file, spool = _new_spool()
+    sha = hashlib.sha256()
+    rest = ""
+    try:
+        with file:
+            for start in range(0, len(encoded), PAYLOAD_CHUNK_SIZE):
+                # cada bloco é decodificado em grupos completos de 4 caracteres, o restante segue para o próximo
+                chunk = rest + "".join(encoded[start:start + PAYLOAD_CHUNK_SIZE].split())
+                cut = len(chunk) - len(chunk) % 4
+                rest = chunk[cut:]
+
+                decoded = binascii.a2b_base64(chunk[:cut])
+                sha.update(decoded)
+                file.write(decoded)
+
+            if rest:
+                decoded = binascii.a2b_base64(rest)
+                sha.update(decoded)
+                file.write(decoded)
+    except binascii.Error:
+        spool._finalizer()
+        return None
+
+    return spool, sha.hexdigest()
+
+
+def _decode_attachment(part: _email.message.Message) -> tuple[bytes|AttachmentSpool, Optional[str]]:
+    # anexos pequenos mantêm os próprios bytes decodificados (fatiados com memoryview ao salvar, sem cópias)
+    # e os grandes vão direto para o disco, evitando manter todos os anexos recebidos na memória
+    # (o hash dos grandes é calculado aqui, para que sejam copiados entre arquivos pelo kernel ao salvar)
+    encoded = part.get_payload()
+    encoding = str(part.get("Content-Transfer-Encoding", "")).strip().lower()
+    if encoding == "base64" and isinstance(encoded, str) and len(encoded) // 4 * 3 > ATTACHMENT_SPOOL_SIZE:
+        spooled = _spool_base64(encoded)
+        # base64 malformado segue pelo decodificador tolerante do pacote email
+        if spooled is not None:
+            return spooled
+
+    payload = part.get_payload(decode=True)
+    if len(payload) <= ATTACHMENT_SPOOL_SIZE:
+        return payload, None
+
+    digest = hashlib.sha256(payload).hexdigest()
+    file, spool = _new_spool()
+    with file:
+        file.write(payload)
+    return spool, digest
+
+
+def _parse_body(data: bytes) -> tuple[Optional[bytes], Optional[str], dict[str, Attachment]]:
+    # toda a interpretação do conteúdo MIME fica aqui, isolada do protocolo SMTP (handle_DATA)
+    head, body = _split_head(data)
+    headers = BytesHeaderParser().parsebytes(head)
+
+    # caminho rápido: e-mails de uma só parte text/plain, sem codificação de transferência, não passam pelo parser MIME completo
+    encoding = str(headers.get("Content-Transfer-Encoding", "7bit")).strip().lower()
+    if headers.get_content_type() == "text/plain" and encoding in ("7bit", "8bit", "binary"):
+        return body.strip(), headers.get_content_charset(), {}
+
+    content = _email.message_from_bytes(data)
+    text = None
+    charset = None
+    attachments = {}
+
+    if content.is_multipart():
+        for part in content.walk():
+            # contêineres multipart não possuem conteúdo próprio
+            if part.is_multipart():
+                continue
+
+            filename = part.get_filename()
+            content_type = part.get_content_type()
+
+            if filename:
+                main_type, _, sub_type = content_type.partition("/")
+                payload, digest = _decode_attachment(part)
+
+                attachments[filename] = Attachment(content_type, main_type, sub_type, payload, digest)
+
+            elif content_type == "text/plain":
+                # somente as partes usadas são decodificadas (text/html e outras alternativas são ignoradas)
+                text = part.get_payload(decode=True)
+                charset = part.get_content_charset()
+    else:
+        text = content.get_payload(decode=True).strip()
+        charset = content.get_content_charset()
+
+    # o texto segue em bytes, sendo decodificado somente quando Email.content for acessado
+    return text, charset, attachments
+
+
+def _new_receiver_loop() -> asyncio.AbstractEventLoop:
+    """
+    USO INTERNO
+
+    cria o loop de eventos de um receptor, usando a biblioteca "uvloop" (libuv) quando estiver instalada e o loop padrão do asyncio caso contrário.
+    """
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+
+    return asyncio.new_event_loop()
+
+
+class _ReusePortController(Controller):
+    """
+    USO INTERNO - controlador que compartilha a porta com outros controladores (SO_REUSEPORT), deixando o kernel distribuir as conexões entre eles
+    """
+
+    def _create_server(self):
+        return self.loop.create_server(
+            self._factory_invoker,
+            host=self.hostname,
+            port=self.port,
+            ssl=self.ssl_context,
+            reuse_port=True
+        )
+
+
+    def _trigger_server(self):
+        # a conexão de teste pode ser atendida por outro controlador na mesma porta, então é repetida até chegar neste
+        last_error = None
+        for _ in range(TRIGGER_ATTEMPTS):
+            try:
+                super()._trigger_server()
+            except socket.timeout as error:
+                last_error = error
+            if self._factory_invoked.is_set():
+                return
+
+        # sem a conexão de teste, o erro só apareceria depois, como o TimeoutError genérico de Controller.start()
+        raise TimeoutError(parse_message(TRIGGER_FAILED, PORT=self.port, ATTEMPTS=TRIGGER_ATTEMPTS)) from last_error
+
+
 class _Handler:
-    __slots__ = ["emails", "path", "extension"]
+    __slots__ = ["emails", "received", "path", "extension", "_save_workers", "_waiters", "_lock", "_dirs"]
 
-    emails: list[Email]
+    emails: deque[Email]
+    received: int
     path: Optional[Path]
     extension: str
-
-    def __init__(self):
-        self.emails = []
+    _save_workers: dict[asyncio.AbstractEventLoop, tuple[asyncio.Queue, asyncio.Task]]
+    _waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]
+    _lock: threading.Lock
+    _dirs: set[str]
+
+    def __init__(self, max_emails: int=MAX_RECEIVED_EMAILS):
+        # somente os `max_emails` e-mails mais recentes são mantidos; `received` conta todos (número de sequência do último)
+        self.emails = deque(maxlen=max_emails)
+        self.received = 0
         self.path = None
         self.extension = ".txt"
+        self._save_workers = {}
+        self._waiters = set()
+        self._lock = threading.Lock()
+        self._dirs = set()
+
+
+    def add_waiter(self, waiter: tuple[asyncio.AbstractEventLoop, asyncio.Event]):
+        self._waiters.add(waiter)
+
+
+    def remove_waiter(self, waiter: tuple[asyncio.AbstractEventLoop, asyncio.Event]):
+        self._waiters.discard(waiter)
+
+
+    def received_since(self, sequence: int) -> tuple[list[Email], int]:
+        """
+        USO INTERNO - retorna os e-mails recebidos após o número de sequência `sequence` (ainda mantidos) e o número de sequência atual
+        """
+        with self._lock:
+            received = self.received
+            count = min(received - sequence, len(self.emails))
+            emails = list(itertools.islice(reversed(self.emails), count))
+
+        emails.reverse()
+        return emails, received
+
+
+    def _notify(self):
+        # os aguardadores rodam em outro loop (e outra thread) que não o do controlador
+        for loop, new_email in list(self._waiters):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(new_email.set)
 
 
     async def handle_DATA(self, server, session, envelope: Envelope):
-        content = _email.message_from_bytes(envelope.content)
+        date, subject = _parse_headers(envelope.content)
+
         receiver = Email(
             sender=envelope.mail_from, 
             destination=envelope.rcpt_tos,
-            date=content["Date"]
+            date=date
         )
-        receiver.subject = content["Subject"].strip()
-
-        if content.is_multipart():
-            for part in content.walk():
-                filename = part.get_filename()
-                content_type = part.get_content_type()
-                payload = part.get_payload(decode=True)
-
-                if filename:
-                    receiver.attachments[filename] = {
-                        "content_type": content_type,
-                        "main_type": part.get_content_maintype(),
-                        "sub_type": part.get_content_subtype(),
-                        "payload": payload
-                    }
-
-                elif content_type == "text/plain":
-                    receiver.content = payload.decode()
-        else:
-            payload = content.get_payload(decode=True)
-            receiver.content = payload.decode().strip()
-
-        self.emails.append(receiver)
+        receiver.subject = subject
+        # o corpo só é interpretado quando o conteúdo ou os anexos forem acessados
+        receiver.set_raw(envelope.content, _parse_body)
+
+        # os receptores (workers) rodam em threads diferentes
+        with self._lock:
+            self.emails.append(receiver)
+            self.received += 1
+        self._notify()
         if self.path is not None:
-            self.save(receiver)
+            # o salvamento ocorre em segundo plano, sem atrasar a resposta ao cliente SMTP
+            self._queue_save(receiver)
 
         return "250 OK"
     
 
-    def save(self, email: Email):
+    def _queue_save(self, email: Email):
+        loop = asyncio.get_running_loop()
+
+        # cada controlador (loop) possui seu worker, criado sob demanda e recriado caso tenha sido cancelado em close()
+        worker = self._save_workers.get(loop)
+        if worker is None or worker[1].done():
+            queue = asyncio.Queue()
+            worker = self._save_workers[loop] = (queue, loop.create_task(self._save_worker(queue)))
+
+        worker[0].put_nowait(email)
+
+
+    async def _save_worker(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+
+            # aguarda brevemente pelos demais e-mails de uma mesma rajada, salvando-os em um único lote
+            deadline = loop.time() + SAVE_BATCH_DELAY
+            while len(batch) < SAVE_BATCH_SIZE:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                errors = await asyncio.to_thread(self.save_batch, batch)
+            except (Exception, TempEmailBaseExceptions) as error:
+                errors = [error] * len(batch)
+
+            # o cliente SMTP já recebeu a resposta, então as falhas são reportadas ao loop de eventos
+            for email, error in zip(batch, errors):
+                if error is not None:
+                    loop.call_exception_handler({
+                        "message": parse_message(SAVE_FAILED, RID=email.rid),
+                        "exception": error
+                    })
+
+            for _ in batch:
+                queue.task_done()
+
+
+    def flush(self):
+        """
+        USO INTERNO - aguarda os e-mails pendentes serem salvos (chamado antes de encerrar os controladores)
+        """
+        for loop, (queue, task) in list(self._save_workers.items()):
+            if loop.is_running() and not task.done():
+                asyncio.run_coroutine_threadsafe(queue.join(), loop).result()
+
+
+    def save_batch(self, emails: list[Email]) -> list[Optional[BaseException]]:
         if not self.path:
             raise PathNotFoundException(PATH_ARE_NOT_DEFINED)
-                
-        self.path.mkdir(True)
 
-        email_path = self.path.join("".join(email.destination))
-        email_path.parser(in_self=True, full=False)
-        email_path.mkdir(True)
+        # caminhos dos destinatários já tratados neste lote
+        email_paths: dict[str|tuple[str, ...], Path] = {}
+        errors = []
+        for email in emails:
+            try:
+                destination = email.destination
+                key = tuple(destination) if isinstance(destination, list) else destination
+                email_path = email_paths.get(key)
+                if email_path is None:
+                    email_path = self.path.join(_destination_name(destination))
+                    email_path.parser(in_self=True, full=False)
+                    email_paths[key] = email_path
+
+                self._save_in(email_path, email)
+                errors.append(None)
+            except (Exception, TempEmailBaseExceptions) as error:
+                errors.append(error)
+
+        return errors
+
+
+    def _ensure_dir(self, path: str):
+        # cria o diretório (e os anteriores) somente na primeira vez em que este receptor o usa
+        if path not in self._dirs:
+            os.makedirs(path, exist_ok=True)
+            self._dirs.add(path)
+
+
+    def _save_in(self, email_path: Path, email: Email):
+        email_dir = str(email_path)
+        self._ensure_dir(email_dir)
+
+        # o nome do assunto é testado diretamente com os.mkdir (uma única chamada no caso comum, sem verificações prévias)
+        subject = Path(str(email.subject)).parser(full=False).name
+        subject_path = email_path.join(subject)
+        while True:
+            try:
+                # criação atômica: se outro receptor (worker) obtiver o mesmo nome, um novo é escolhido
+                os.mkdir(str(subject_path))
+                break
+            except FileExistsError:
+                # assunto repetido: Path.free_name encontra o próximo contador livre com O(log n) verificações
+                subject_path = email_path.free_name(subject)
+            except FileNotFoundError:
+                # o diretório do destinatário foi removido depois de ter sido criado: somente ele é esquecido
+                self._dirs.discard(email_dir)
+                self._ensure_dir(email_dir)
 
-        subject_path = email_path.free_name(email.subject, parser=True)
-        subject_path.mkdir(True)
+        # o diretório do assunto é novo: somente o conteúdo e os metadados ocupam nomes nele
+        att_used = {"content" + self.extension, "metadata.json"}
 
         content_path = subject_path.join("content" + self.extension)
-        with content_path.file("w", True) as content_file:
-            content_file.write(email.content)
+        _write_file(str(content_path), [email.content_bytes])
 
         metadata = {
             "subject": email.subject,
@@ -117,29 +639,45 @@ class _Handler:
         if email.attachments:
             meta_att = []
             for att_name, data in email.attachments.items():
-                ext = mimetypes.guess_extension(data["content_type"]) or ".bin"
+                ext = guess_extension(data.content_type)
                 att_name += ext
 
-                att_path = subject_path.free_name(att_name)
-                with att_path.file("wb", True) as att_file:
-                    att_file.write(data["payload"])
-
+                # o hash é calculado junto da escrita, bloco a bloco, sem materializar o anexo inteiro
+                # o hash já calculado na recepção é reaproveitado, caso contrário é calculado durante a escrita
+                digest = data.sha256
+                att_base, att_ext = os.path.splitext(att_name)
+                att_path = subject_path.join(_free_name(att_base, att_used, att_ext))
+                fd = _open_file(str(att_path))
+                try:
+                    if digest is None or not _copy_file(data.payload, fd):
+                        sha = hashlib.sha256() if digest is None else None
+                        buffers = []
+                        for chunk in iter_payload(data.payload):
+                            if sha is not None:
+                                sha.update(chunk)
+                            buffers.append(chunk)
+
+                            if len(buffers) == WRITEV_BUFFERS:
+                                _write_buffers(fd, buffers)
+                                buffers = []
+
+                        _write_buffers(fd, buffers)
+                        if sha is not None:
+                            digest = sha.hexdigest()
+                finally:
+                    os.close(fd)
+
+                # o nome registrado é o usado no disco, que pode ter recebido um contador
                 meta_att.append({
-                    "name": att_name,
-                    "type": data["content_type"],
-                    "hash": hashlib.sha256(data["payload"]).hexdigest()
+                    "name": att_path.name,
+                    "type": data.content_type,
+                    "hash": digest
                 })
 
             metadata["attachments"] = meta_att
 
         metadata_path = subject_path.join("metadata.json")
-        with metadata_path.file("w", True) as metadata_file:
-            json.dump(
-                metadata, 
-                fp=metadata_file, 
-                indent=4,
-                ensure_ascii=False
-            )
+        _write_file(str(metadata_path), [dump_json(metadata)])
 
 
 class EmailHandler:
@@ -150,6 +688,10 @@ class EmailHandler:
 
         receiver_running (bool): retorna um booleano que indica se o receptor está ativo ou não
 
+        async def send_async(self, email_data: Email|list[Email], connections: int=SEND_CONNECTIONS) -> Report: envia e-mails sem bloquear o loop de eventos, usando várias conexões SMTP simultâneas
+
+        def send_template(self, base: Email, variants: list[dict]) -> Report: envia o mesmo e-mail para vários destinatários, montando a mensagem uma única vez
+
         def wait_emails(self, address: Optional[str]=None, repeat: Optional[int]=None, timeout: Optional[float]=None, raiser: bool=True) -> AsyncGenerator[Email]: aguarda e-mails e retorna-os, podendo filtrá-los baseado em um endereço de e-mail específico
 
     ### uso básico:
@@ -166,38 +708,55 @@ class EmailHandler:
                     print(f"de: {email.sender} | para: {email.destination}") # de: sender@example.com | para: [destination@example.com]
         
     """
-    __slots__ = ["_handler", "_controller", "path", "extension", "_receiver_running", "_env"]
+    __slots__ = ["_handler", "_controllers", "path", "extension", "_receiver_running", "_env", "_smtp"]
 
     _handler: _Handler
-    _controller: Controller
+    _controllers: list[Controller]
     _receiver_running: bool
+    _smtp: Optional[smtplib.SMTP]
     path: Optional[Path]
     extension: str
     _env: EnvHandler
 
 
-    def __init__(self, env: EnvHandler):
+    def __init__(self, env: EnvHandler, workers: int=RECEIVER_WORKERS, max_emails: int=MAX_RECEIVED_EMAILS):
         """
         manipula o envio, recebimento e salvamento de e-mails.
 
         ### parâmetros:
 
             env (EnvHandler): instância do manipulador de variáveis de ambiente
+            workers (int): quantidade de receptores (cada um com seu próprio loop de eventos) escutando a mesma porta, com as conexões distribuídas pelo kernel (padrão 1)
+            max_emails (int): quantidade máxima de e-mails recebidos mantidos em memória, descartando os mais antigos (padrão 10000)
         """
-        if not isinstance(env, EnvHandler):
+        def _raiser_UTE(i, e, p):
             raise UnexpectedTypeException(parse_message(
                 UNEXPECTED_TYPE,
                 METHOD="EmailHandler(...)",
-                EXPECTED="EnvHandler",
-                PARAMETER="env",
-                RECEIVED=f"{type(env).__name__} ({env})"
+                EXPECTED=e,
+                PARAMETER=p,
+                RECEIVED=f"{type(i).__name__} ({i})"
             ))
+        if not isinstance(env, EnvHandler):
+            _raiser_UTE(env, "EnvHandler", "env")
+        elif not isinstance(workers, int) or isinstance(workers, bool):
+            _raiser_UTE(workers, "int", "workers")
+        elif not isinstance(max_emails, int) or isinstance(max_emails, bool):
+            _raiser_UTE(max_emails, "int", "max_emails")
+        elif workers < 1:
+            raise UnexpectedValueException(parse_message(INVALID_WORKERS, WORKERS=workers))
+        elif max_emails < 1:
+            raise UnexpectedValueException(parse_message(INVALID_MAX_EMAILS, MAX_EMAILS=max_emails))
         self.path = None
-        self._handler = _Handler()
-        self._controller = Controller(self._handler, env.SERVER, env.PORT)
+        self._handler = _Handler(max_emails)
+        if workers == 1:
+            self._controllers = [Controller(self._handler, env.SERVER, env.PORT, loop=_new_receiver_loop())]
+        else:
+            self._controllers = [_ReusePortController(self._handler, env.SERVER, env.PORT, loop=_new_receiver_loop()) for _ in range(workers)]
         self._receiver_running = False
         self.extension = ".txt"
         self._env = env
+        self._smtp = None
 
 
     @property
@@ -208,45 +767,65 @@ class EmailHandler:
         return self._receiver_running
 
 
-    async def _get_emails(self, rids: list[str], timeout: Optional[float]=None, raiser: bool=True) -> None|list[Email]:
+    async def _get_emails(self, rid_founds: set[str], timeout: Optional[float]=None, raiser: bool=True) -> AsyncGenerator[Email]:
         if not self._receiver_running:
             raise ReceiverOFFException(parse_message(RECEIVER_OFF, OBJECTIVE="get"))
         
-        response = []
-        rid_founds = rids.copy()
+        last_sequence = 0
 
-        async def _getter():
+        new_email = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), new_email)
+
+        self._handler.add_waiter(waiter)
+        try:
             while True:
-                emails = self._handler.emails
+                new_email.clear()
 
+                # somente os e-mails recebidos desde a última verificação (pelo número de sequência) são inspecionados, e entregues um a um
+                emails, last_sequence = self._handler.received_since(last_sequence)
                 for email in emails:
                     if not email.rid in rid_founds:
+                        rid_founds.add(email.rid)
+                        yield email
+
+                try:
+                    await asyncio.wait_for(new_email.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    if raiser:
+                        raise TimeoutException(parse_message(TIMEOUT, TIME=timeout))
+                    return
+        finally:
+            self._handler.remove_waiter(waiter)
+            
 
-                        rid_founds.append(email.rid)
-
-                        response.append(email)
+    def _get_smtp(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            self._smtp = smtplib.SMTP("localhost", 1025)
 
-                    if response:
-                        return response
+        return self._smtp
+    
 
-                await asyncio.sleep(WAIT_EMAIL_COOLDOWN)
+    def _close_smtp(self, quit: bool=True):
+        # após uma falha o estado da conexão é desconhecido (QUIT poderia ficar sem resposta), então ela é apenas fechada
+        if self._smtp is not None:
+            try:
+                if quit:
+                    self._smtp.quit()
+                else:
+                    self._smtp.close()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
 
-        try:
-            emails = await asyncio.wait_for(_getter(), timeout=timeout)
-            return emails
-        except asyncio.TimeoutError:
-            if raiser:
-                raise TimeoutException(parse_message(TIMEOUT, TIME=timeout))
-            
 
     def _get_handler(self, email_data: Email) -> EmailMessage:
         handler = EmailMessage()
 
-        handler["From"] = email_data.sender 
-        handler["To"] = email_data.destination
-        handler["Subject"] = email_data.subject
-        handler["Date"] = email_data.date
-        handler.set_content(email_data.content)
+        handler["From"] = _header("From", email_data.sender)
+        handler["To"] = _header("To", _addresses(email_data.destination))
+        handler["Subject"] = _header("Subject", email_data.subject)
+        handler["Date"] = _header("Date", email_data.date)
+        _set_text_content(handler, email_data.content)
 
         return handler
     
@@ -255,28 +834,64 @@ class EmailHandler:
         for att_name, path in attachments.items():
             if path:
                 path = Path(path)
-                mime_type, _ = mimetypes.guess_type(str(path))
-                mime_type = mime_type or "application/octet-stream"
+                mime_type = guess_type(path.name)
                 main_type, sub_type = mime_type.split("/")
                 
-                if not path.exists():
+                if not path.exists:
                     raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=path, TYPE="attachment"))
 
-                with path.file("rb") as file:        
-                    content = file.read()
-
-                    handler.add_attachment(
-                        content,
-                        maintype=main_type,
-                        subtype=sub_type,
-                        filename=att_name
-                    )
+                with path.file("rb") as file:
+                    # o arquivo é mapeado em memória: o kernel carrega as páginas sob demanda durante a codificação, sem uma cópia em bytes
+                    content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b""
+
+                    try:
+                        handler.add_attachment(
+                            content,
+                            maintype=main_type,
+                            subtype=sub_type,
+                            filename=att_name,
+                            content_manager=_attachment_manager
+                        )
+                    finally:
+                        if isinstance(content, mmap.mmap):
+                            content.close()
             
 
+    def _check_email_data(self, email_data: Email|list[Email], method: str):
+        def _raiser_UTE(e):
+            if not isinstance(e, Email):
+                raise UnexpectedTypeException(parse_message(
+                    UNEXPECTED_TYPE, 
+                    METHOD=method,
+                    EXPECTED="Email|list[Email]",
+                    PARAMETER="email_data",
+                    RECEIVED=f"{type(e).__name__} ({e})"
+                ))
+        
+        if isinstance(email_data, list):
+            for e in email_data:
+                _raiser_UTE(e)
+        else:
+            _raiser_UTE(email_data)
+
+
+    def _prepare_message(self, email: Email) -> EmailMessage:
+        email.date = formatdate(localtime=True)
+        email.gen_rid()
+        handler = self._get_handler(email)
+
+        if email.attachments:
+            self._add_attachments(handler, **email.attachments)
+
+        return handler
+    
+
     def send(self, email_data: Email|list[Email]) -> Report:
         """
         método responsável por enviar e-mails
 
+        uma única conexão SMTP é aberta e reaproveitada entre os e-mails (e entre chamadas), sendo encerrada em `EmailHandler.close()`
+
         ### parâmetros:
 
             email_data (Email|list[Email]): instância da classe `Email`, que agrupa informações de um e-mail (tanto de enviados como de recebidos)
@@ -288,33 +903,27 @@ class EmailHandler:
             handler = EmailHandler(env_handler)
             handler.send(email)
         """
-        def _raiser_UTE(e):
-            if not isinstance(e, Email):
-                raise UnexpectedTypeException(parse_message(
-                    UNEXPECTED_TYPE, 
-                    METHOD="EmailHandler.send(...)",
-                    EXPECTED="Email|list[Email]",
-                    PARAMETER="email_data",
-                    RECEIVED=f"{type(e).__name__} ({e})"
-                ))
-        
-        [_raiser_UTE(e) for e in email_data] if isinstance(email_data, list) else _raiser_UTE(email_data)
+        self._check_email_data(email_data, "EmailHandler.send(...)")
         
         def _send(email: Email):
             try:
-                email.date = formatdate(localtime=True)
-                email.gen_rid()
-                handler = self._get_handler(email)
-
-                if email.attachments:
-                    self._add_attachments(handler, **email.attachments)
+                handler = self._prepare_message(email)
 
-                with smtplib.SMTP("localhost", 1025) as smtp:
-                    smtp.send_message(handler)
+                try:
+                    _stream_message(self._get_smtp(), handler)
+                except smtplib.SMTPServerDisconnected:
+                    # a conexão reaproveitada foi encerrada pelo servidor, reconecta uma única vez
+                    self._close_smtp()
+                    _stream_message(self._get_smtp(), handler)
 
                 return STATUS_250
-            except ConnectionRefusedError:
+            except (smtplib.SMTPException, OSError):
+                # somente este e-mail falha; a conexão reaproveitada é descartada e reaberta no próximo envio
+                self._close_smtp(quit=False)
                 return STATUS_500
+            except BaseException:
+                self._close_smtp(quit=False)
+                raise
 
         if isinstance(email_data, list):
             report = Report(STATUS_250)
@@ -335,6 +944,154 @@ class EmailHandler:
         )
     
 
+    async def send_async(self, email_data: Email|list[Email], connections: int=SEND_CONNECTIONS) -> Report:
+        """
+        envia e-mails sem bloquear o loop de eventos, distribuindo-os entre várias conexões SMTP simultâneas
+
+        ### parâmetros:
+
+            email_data (Email|list[Email]): instância da classe `Email`, que agrupa informações de um e-mail (tanto de enviados como de recebidos)
+            connections (int): quantidade máxima de conexões SMTP abertas em paralelo, maior que 0 (cada conexão envia sua parte dos e-mails em sequência)
+
+        ### uso:
+
+            emails = [Email(...), Email(...), ...]
+
+            handler = EmailHandler(env_handler)
+
+            async def function_example():
+                report = await handler.send_async(emails, connections=4)
+        """
+        self._check_email_data(email_data, "EmailHandler.send_async(...)")
+        if not isinstance(connections, int) or isinstance(connections, bool):
+            raise UnexpectedTypeException(parse_message(
+                UNEXPECTED_TYPE,
+                METHOD="EmailHandler.send_async(...)",
+                EXPECTED="int",
+                PARAMETER="connections",
+                RECEIVED=f"{type(connections).__name__} ({connections})"
+            ))
+        elif connections < 1:
+            raise UnexpectedValueException(parse_message(INVALID_CONNECTIONS, CONNECTIONS=connections))
+        
+        emails = email_data if isinstance(email_data, list) else [email_data]
+
+        def _send_chunk(chunk: list[Email]) -> list[Email]:
+            error = []
+            smtp = None
+            try:
+                for email in chunk:
+                    try:
+                        if smtp is None:
+                            smtp = smtplib.SMTP("localhost", 1025)
+                        _stream_message(smtp, self._prepare_message(email))
+                    except (smtplib.SMTPException, OSError) as exc:
+                        # somente este e-mail falha; recusas do servidor mantêm a conexão (a transação já foi reiniciada com RSET),
+                        # mas uma conexão que caiu ou ficou em estado desconhecido é descartada e reaberta no próximo envio
+                        error.append(email)
+                        dropped = isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException)
+                        if smtp is not None and (dropped or smtp.sock is None):
+                            smtp.close()
+                            smtp = None
+            finally:
+                if smtp is not None:
+                    try:
+                        smtp.quit()
+                    except (smtplib.SMTPException, OSError):
+                        smtp.close()
+            
+            return error
+
+        # distribui os e-mails de forma intercalada entre as conexões
+        chunks = [emails[i::connections] for i in range(min(connections, len(emails)))]
+        results = await asyncio.gather(*[asyncio.to_thread(_send_chunk, chunk) for chunk in chunks])
+
+        error = [email for result in results for email in result]
+        status = STATUS_250
+        if error:
+            status = STATUS_500 if len(error) == len(emails) else STATUS_200
+
+        return Report(status=status, error=error)
+    
+
+    def send_template(self, base: Email, variants: list[dict[Literal["destination", "subject"], str|list[str]]]) -> Report:
+        """
+        envia o mesmo e-mail para vários destinatários, montando a mensagem (conteúdo e anexos) uma única vez
+
+        ### parâmetros:
+
+            base (Email): e-mail usado como modelo (remetente, assunto, conteúdo e anexos)
+            variants (list[dict]): destinatário ("destination") e, opcionalmente, assunto ("subject") de cada envio
+
+        ### uso:
+
+            base = Email(destination=[], sender="sender@example.com", subject="aviso", content="conteúdo do aviso")
+
+            handler = EmailHandler(env_handler)
+            handler.send_template(base, [
+                {"destination": "address1@example.com"},
+                {"destination": "address2@example.com", "subject": "aviso para address2"}
+            ])
+
+        ### observação:
+
+            - somente os cabeçalhos "To" e "Subject" mudam entre os envios, o corpo já codificado é reaproveitado
+        """
+        def _raiser_UTE(i, e, p):
+            raise UnexpectedTypeException(parse_message(
+                UNEXPECTED_TYPE,
+                METHOD="EmailHandler.send_template(...)",
+                EXPECTED=e,
+                PARAMETER=p,
+                RECEIVED=f"{type(i).__name__} ({i})"
+            ))
+        if not isinstance(base, Email):
+            _raiser_UTE(base, "Email", "base")
+        elif not isinstance(variants, list):
+            _raiser_UTE(variants, "list[dict]", "variants")
+        for variant in variants:
+            if not isinstance(variant, dict):
+                _raiser_UTE(variant, "dict", "variants")
+        
+        handler = self._prepare_message(base)
+
+        error = []
+        for variant in variants:
+            destination = variant["destination"]
+            subject = variant.get("subject", base.subject)
+
+            del handler["To"]
+            handler["To"] = _header("To", _addresses(destination))
+            del handler["Subject"]
+            handler["Subject"] = _header("Subject", subject)
+
+            try:
+                try:
+                    _stream_message(self._get_smtp(), handler, from_addr=base.sender, to_addrs=destination)
+                except smtplib.SMTPServerDisconnected:
+                    self._close_smtp()
+                    _stream_message(self._get_smtp(), handler, from_addr=base.sender, to_addrs=destination)
+            except (smtplib.SMTPException, OSError):
+                # somente este destinatário falha; a conexão reaproveitada é descartada e reaberta no próximo envio
+                self._close_smtp(quit=False)
+                error.append(Email(
+                    destination=destination,
+                    sender=base.sender,
+                    subject=subject,
+                    content=base.content,
+                    date=base.date
+                ))
+            except BaseException:
+                self._close_smtp(quit=False)
+                raise
+
+        status = STATUS_250
+        if error:
+            status = STATUS_500 if len(error) == len(variants) else STATUS_200
+
+        return Report(status=status, error=error)
+    
+
     @overload
     async def wait_emails(self, /, repeat: Optional[int]=None, timeout: Optional[float]=None, raiser: bool=True) -> AsyncGenerator[Email]: ...
 
@@ -385,16 +1142,12 @@ class EmailHandler:
         elif not self._receiver_running:
             raise ReceiverOFFException(parse_message(RECEIVER_OFF, OBJECTIVE="wait"))
         
-        rid_founds = []
-
-        while repeat is None or repeat > 0:
-            emails = await self._get_emails(rid_founds, timeout, raiser)
-            if emails is None:
-                break
-            
-            for email in emails:
-                rid_founds.append(email.rid)
+        if repeat is not None and repeat <= 0:
+            return
 
+        emails = self._get_emails(set(), timeout, raiser)
+        try:
+            async for email in emails:
                 if address is not None and address not in email.destination:
                     continue
 
@@ -404,12 +1157,11 @@ class EmailHandler:
                 yield email
 
                 if repeat is not None:
-                    if repeat > 0:
-                        repeat -= 1
-                    else:
+                    repeat -= 1
+                    if repeat <= 0:
                         break
-
-            await asyncio.sleep(WAIT_EMAIL_COOLDOWN)
+        finally:
+            await emails.aclose()
 
 
     def save_in(self, path: Path, extension: str=".txt"):
@@ -442,6 +1194,8 @@ class EmailHandler:
                 ...
 
             os pontos especias, como "@", "/", "-", etc, são convertidos em "_"
+
+            quando os destinatários juntos ultrapassam 128 caracteres, o nome do diretório é abreviado e recebe um hash dos endereços
             
         """
         def _raiser_UTE(i, e, p):
@@ -493,13 +1247,21 @@ class EmailHandler:
                             ...
         """
         if not self.receiver_running:
-            self._controller.start()
+            started = []
+            try:
+                for controller in self._controllers:
+                    controller.start()
+                    started.append(controller)
+            except BaseException:
+                for controller in started:
+                    controller.stop()
+                raise
             self._receiver_running = True
 
 
     def close(self) -> None:
         """
-        fecha o servidor SMTP caso esteja aberto
+        fecha o servidor SMTP caso esteja aberto e encerra a conexão de envio reaproveitada por `send`
 
         ### uso:
 
@@ -526,8 +1288,13 @@ class EmailHandler:
                         async for email in emails:
                             ...
         """
+        self._close_smtp()
+
         if self.receiver_running:
-            self._controller.stop()
+            self._handler.flush()
+            for controller in self._controllers:
+                controller.stop()
+            self._handler._save_workers.clear()
             self._receiver_running = False
 
     
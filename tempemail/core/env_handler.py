@@ -1,5 +1,7 @@
 import os
+import io
 import dotenv 
+from dotenv.parser import parse_stream
 from typing import TypeAlias, Literal, Optional
 
 from .utils import parse_message, Path
@@ -16,6 +18,15 @@ _COMMON: TypeAlias = Literal["__COMMON__"]
 
 
 _DEFAULT_PATH = Path(".env")
+
+
+def _env_line(envname: str, value: str) -> str:
+    # mesmo formato usado por dotenv.set_key (valor sempre entre aspas simples), porém também escapando as barras invertidas:
+    # o leitor de valores entre aspas simples interpreta "\\" como uma única barra, então sem o escape (como em set_key até python-dotenv 1.1.x) o valor lido seria outro
+    escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+    return f"{envname}='{escaped}'\n"
+
+
 class EnvHandler:
     """
     classe responsável por manipular variáveis de ambientes.
@@ -76,6 +87,7 @@ class EnvHandler:
             "PORT": {"rule": _REQUIRED, "default": None}
         }
         self._envpath = envpath
+        self._loaded: Optional[tuple[Optional[tuple[int, int]], dict[str, str]]] = None
         self.set_default(exists_ok=True, reload=False)
 
         self._set_unique_instance(str(envpath), self)
@@ -102,16 +114,13 @@ class EnvHandler:
             print(env.SECRET_KEY) # "my_secret_key_123"
             print(env.TOKEN) # "my_token_123"
         """
-        envs = {}
-        with self._envpath.file() as envpath:
-            envpath_content = envpath.readlines()
-
-            for line in envpath_content:
-                if len(line) >= 3 and "=" in line:
-                    line_splited = line.split("=")
-                    envs[line_splited[0]] = line_splited[1].replace("'", "").strip()
+        envs = {
+            envname: value
+            for envname, value in dotenv.dotenv_values(str(self._envpath)).items()
+            if value is not None
+        }
 
-        self.set_env(**envs)
+        self.set_env(reload=False, **envs)
 
         self.load()
 
@@ -129,16 +138,30 @@ class EnvHandler:
 
             print(env.VARIABLE) # "variable_value"
         """
-        dotenv.load_dotenv(
-            str(self._envpath),
-            override=True
-        )
-
+        envpath = str(self._envpath)
+        try:
+            stat = os.stat(envpath)
+            version = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            # assim como em dotenv.load_dotenv, um arquivo inexistente não é um erro: somente as variáveis do processo são usadas
+            version = None
+
+        # o arquivo só é lido novamente quando foi alterado (ou criado) desde a última carga
+        if self._loaded is None or self._loaded[0] != version:
+            values = {}
+            if version is not None:
+                values = {name: value for name, value in dotenv.dotenv_values(envpath).items() if value is not None}
+            os.environ.update(values)
+            self._loaded = (version, values)
+
+        values = self._loaded[1]
         for envname, info in self.__expecteds__.items():
             rule = info["rule"]
             default = info["default"]
 
-            value = os.getenv(envname, default)
+            value = values.get(envname)
+            if value is None:
+                value = os.environ.get(envname, default)
 
             if not value and rule is _REQUIRED:
                 raise EnvironmentVariableRequiredException(parse_message(MISSING_VARIABLE, NAME=envname))
@@ -174,6 +197,7 @@ class EnvHandler:
             - se uma variável obrigatória for None ou possuir um valor vazio (""), ocorrerá um erro ao usar EnvHandler.load() -> EnvironmentVariableRequiredException
 
         """
+        values = {}
         for envname, value in envdata.items():
             rule = "common"
             if isinstance(value, dict):
@@ -186,12 +210,54 @@ class EnvHandler:
             if envname not in self.__expecteds__ or not setteds_ok:
                 self.__expecteds__[envname] = {"rule": _REQUIRED, "default": None} if rule == "required" else {"rule": _COMMON, "default": value}
 
-            dotenv.set_key(str(self._envpath), envname, str(value))
+            values[envname] = str(value)
+
+        if self._write_envs(values):
+            # alterações mais rápidas que a resolução do mtime não invalidariam a carga anterior
+            self._loaded = None
             
         if reload:
             self.load()
 
 
+    def _write_envs(self, values: dict[str, str]) -> bool:
+        """
+        USO INTERNO
+
+        grava todas as variáveis de `values` no arquivo "*.env" com uma única leitura e uma única escrita, preservando as demais linhas.
+        retorna False (sem escrever) quando nenhum valor foi alterado.
+        """
+        content = ""
+        if self._envpath.exists:
+            with open(str(self._envpath), encoding="utf-8") as envfile:
+                content = envfile.read()
+
+        lines = []
+        written = set()
+        changed = False
+        for mapping in parse_stream(io.StringIO(content)):
+            if mapping.key in values and mapping.value != values[mapping.key]:
+                lines.append(_env_line(mapping.key, values[mapping.key]))
+                changed = True
+            else:
+                # linhas sem variável, variáveis não informadas e valores inalterados são mantidos como estão
+                lines.append(mapping.original.string)
+            written.add(mapping.key)
+
+        missing = [envname for envname in values if envname not in written]
+        if not changed and not missing:
+            return False
+
+        if missing and lines and not lines[-1].endswith("\n"):
+            lines.append("\n")
+        lines.extend(_env_line(envname, values[envname]) for envname in missing)
+
+        with open(str(self._envpath), "w", encoding="utf-8") as envfile:
+            envfile.write("".join(lines))
+
+        return True
+
+
     def set_default(self, exists_ok: bool=True, reload: bool=True):
         """
         define todas as variáveis para os valores padrões.
@@ -233,11 +299,8 @@ class EnvHandler:
 
     @classmethod
     def _set_unique_instance(cls, envpath: str, instance: "EnvHandler"):
-        if not cls.__instance__:
-            if envpath is None:
-                raise EmptyEnvpathException(EMPTY_ENVFILE)
-            cls.__instance__ = {envpath: instance}
-            return
+        if envpath is None:
+            raise EmptyEnvfileException(EMPTY_ENVFILE)
         
         cls.__instance__[str(envpath)] = instance
 
@@ -269,19 +332,18 @@ class EnvHandler:
                 RECEIVED=f"{type(envpath)} ({envpath})"
             ))     
         if envpath is None:
-            keys = list(cls.__instance__.keys())
-            first_key = keys[0]
-
-            instance = cls.__instance__[first_key]
+            # a primeira instância registrada (dicionários mantêm a ordem de inserção)
+            instance = next(iter(cls.__instance__.values()), None)
+            if instance is None:
+                raise EmptyEnvfileException(EMPTY_ENVFILE)
             return instance
         
         instance = cls.__instance__.get(str(envpath))
 
         if instance is None:
+            # o construtor registra a nova instância
             instance = cls(envpath)
 
-        cls._set_unique_instance(str(envpath), instance)
-
         return instance
         
         
@@ -1,4 +1,14 @@
-WAIT_EMAIL_COOLDOWN = 0.2
+SEND_CONNECTIONS = 4
+SAVE_BATCH_SIZE = 64
+SAVE_BATCH_DELAY = 0.005
+ATTACHMENT_SPOOL_SIZE = 1024 * 1024
+PAYLOAD_CHUNK_SIZE = 64 * 1024
+WRITEV_BUFFERS = 16
+RECEIVER_WORKERS = 1
+MAX_RECEIVED_EMAILS = 10_000
+MAX_DESTINATION_NAME = 128
+HEADER_CACHE_SIZE = 1024
+TRIGGER_ATTEMPTS = 64
 OPEN_TEXT_MODE = ['r', 'rb', 'r+', 'rb+', 'w', 'wb', 'w+', 'wb+', 'a', 'ab', 'a+', 'ab+', 'x', 'xb', 'x+', 'xb+']
 DEFAULT_NAME = "anonymous"
 MISSING_VARIABLE = "the <NAME> variable does not exist! <COMPLEMENT>"
@@ -22,6 +32,11 @@ INVALID_EXTENSION = 'the extension must start with "."!'
 UNEXPECTED_RULE = 'rules for environment variables must be "required" or "common"! rule: <RULE>.'
 INVALID_OPEN_TEXT_MODE = f'The file open mode "<MODE>" is invalid! Use: {", ".join([f"{m}" for m in OPEN_TEXT_MODE])}.'
 UNEXPECTED_EXPECTED = 'expected must be "directory" or "file"! expected: <EXPECTED>.'
+INVALID_WORKERS = "the number of receiver workers must be greater than 0! workers: <WORKERS>."
+INVALID_CONNECTIONS = "the number of send connections must be greater than 0! connections: <CONNECTIONS>."
+SAVE_FAILED = "failed to save the received email <RID>!"
+TRIGGER_FAILED = "the receiver on port <PORT> did not answer after <ATTEMPTS> test connections!"
+INVALID_MAX_EMAILS = "the maximum number of received emails kept must be greater than 0! max_emails: <MAX_EMAILS>."
 
 _METADATA_SCHEME_JSON = {
     "$schema": "https://json-schema.org/draft/2020-12/schema",
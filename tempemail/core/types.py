@@ -1,4 +1,4 @@
-from typing import Optional, Literal
+from typing import Optional, BinaryIO
 
 class UserModel:
     name: str
@@ -14,4 +14,4 @@ class Email:
      subject: Optional[str]=None, 
      content: Optional[str]=None, 
      date: Optional[str]=None, 
-     attachments: dict[str, dict[Literal["content_type", "payload", "main_type", "sub_type"], str]]
\ No newline at end of file
+     attachments: dict[str, str|tuple[str, str, str, bytes|BinaryIO, Optional[str]]]
\ No newline at end of file
@@ -1,13 +1,22 @@
 import os
 import re
+import mmap
+import stat
 import json
 import typing
 import hashlib
+import weakref
+import functools
 import mimetypes
 import jsonschema
 from io import TextIOWrapper
 
-from ..models.email_data import Email
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from ..models.email_data import Email, Attachment
 from ..exceptions import *
 from .messeger import (
     PATH_NOT_FOUND,
@@ -20,7 +29,9 @@ from .messeger import (
     UNEXPECTED_TYPE,
     OPEN_TEXT_MODE,
     INVALID_OPEN_TEXT_MODE,
-    UNEXPECTED_EXPECTED
+    UNEXPECTED_EXPECTED,
+    PAYLOAD_CHUNK_SIZE,
+    ATTACHMENT_SPOOL_SIZE
 )
 
 _OPEN_TEXT_MODE: typing.TypeAlias = typing.Literal['r', 'rb', 'r+', 'rb+', 'w', 'wb', 'w+', 'wb+', 'a', 'ab', 'a+', 'ab+', 'x', 'xb', 'x+', 'xb+']
@@ -28,6 +39,13 @@ METADATA: typing.TypeAlias = dict[typing.Literal[
     "subject", "sender", "destination", "date", "rid", "content_length", "extension", "hash", "attachments",
 ], str|int]
 
+# caractéres que podem causar problemas em nomes de arquivos e diretórios (compilado uma única vez, usado por Path.parser)
+_UNSAFE_CHARS = re.compile(r"[^\w\-_/\\.]")
+
+# o esquema dos metadados é verificado e o validador é construído uma única vez (jsonschema.validate refaz os dois a cada chamada)
+_METADATA_VALIDATOR = jsonschema.validators.validator_for(_METADATA_SCHEME_JSON)(_METADATA_SCHEME_JSON)
+_METADATA_VALIDATOR.check_schema(_METADATA_SCHEME_JSON)
+
 __all__ = [
     "Path",
     "is_valid_email_in",
@@ -68,19 +86,240 @@ def parse_message(message: str, complement: typing.Optional[str]=None, **replace
 def get_email_hash(email: "Email") -> str:
     """
     USO INTERNO
+
+    os campos são separados por um caractere nulo. e-mails salvos antes desse formato ainda são aceitos por is_valid_email_in
+    (`_fields_hash(..., legacy=True)`); essa alternativa pode ser removida quando não restarem e-mails salvos no formato anterior.
+    """
+    return _fields_hash(
+        email.subject,
+        email.content,
+        email.sender,
+        email.destination if isinstance(email.destination, list) else [email.destination],
+        email.date
+    )
+
+
+def _normalize(part) -> str:
+    return str(part).strip().lower()
+
+
+def _fingerprint_bytes(subject, content, sender, destination, date) -> bytes:
+    # separador nulo: ("ab", "c") e ("a", "bc") não produzem o mesmo hash
+    return "\0".join(map(_normalize, (subject, content, sender, destination, date or ""))).encode()
+
+
+def _fields_hash(subject, content, sender, destination, date, legacy: bool=False) -> str:
+    # normalização compartilhada por get_email_hash (ao salvar) e is_valid_email_in (ao conferir)
+    if not legacy:
+        return hashlib.sha256(_fingerprint_bytes(subject, content, sender, destination, date)).hexdigest()
+
+    # formato anterior (campos concatenados sem separador), aceito apenas ao conferir e-mails já salvos
+    sha = hashlib.sha256()
+    for part in (subject, content, sender, destination):
+        sha.update(_normalize(part).encode())
+    if date:
+        sha.update(_normalize(date).encode())
+
+    return sha.hexdigest()
+
+
+def dump_json(data: dict) -> bytes:
+    """
+    USO INTERNO
+
+    serializa `data` em JSON compacto (UTF-8, sem indentação nem espaços), usando a biblioteca "orjson" quando estiver instalada.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def load_json(path: "Path") -> dict:
+    """
+    USO INTERNO
+
+    lê um arquivo JSON com uma única leitura em bytes, interpretando-o com a biblioteca "orjson" quando estiver instalada.
+    """
+    with path.file("rb") as file:
+        data = file.read()
+
+    if orjson is not None:
+        return orjson.loads(data)
+    
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=256)
+def guess_extension(content_type: str) -> str:
+    """
+    USO INTERNO
+
+    retorna a extensão correspondente ao tipo MIME (".bin" quando desconhecido), memorizando o resultado.
+    """
+    return mimetypes.guess_extension(content_type) or ".bin"
+
+
+@functools.lru_cache(maxsize=256)
+def guess_type(name: str) -> str:
+    """
+    USO INTERNO
+
+    retorna o tipo MIME correspondente ao nome do arquivo ("application/octet-stream" quando desconhecido), memorizando o resultado.
+    """
+    mime_type, _ = mimetypes.guess_type(name)
+    return mime_type or "application/octet-stream"
+
+
+def iter_payload(payload: "bytes|bytearray|memoryview|typing.BinaryIO|AttachmentSpool", chunk_size: int=PAYLOAD_CHUNK_SIZE) -> typing.Iterator[bytes|memoryview]:
+    """
+    USO INTERNO
+
+    percorre o conteúdo de um anexo em blocos de `chunk_size` bytes, esteja ele em memória (fatias de memoryview, sem cópias) ou em um arquivo temporário (anexos recebidos grandes).
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        view = memoryview(payload)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+        return
+    
+    if isinstance(payload, AttachmentSpool):
+        with payload.open() as file:
+            yield from iter_payload(file, chunk_size)
+        return
+    
+    payload.seek(0)
+    while chunk := payload.read(chunk_size):
+        yield chunk
+
+
+def _remove_spool(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class AttachmentSpool:
+    """
+    USO INTERNO
+
+    conteúdo de um anexo recebido grande, guardado em um arquivo temporário que é aberto somente quando usado.
+    nenhum descritor fica aberto enquanto o e-mail é mantido em memória, e o arquivo é apagado junto com o objeto (ou ao encerrar o programa).
+
+    ### métodos:
+
+        def open(self) -> BinaryIO: abre o arquivo temporário para leitura (deve ser fechado por quem o abriu)
+        def read(self) -> bytes: lê o anexo inteiro
+    """
+    __slots__ = ["path", "_finalizer", "__weakref__"]
+
+    def __init__(self, path: str):
+        self.path = path
+        self._finalizer = weakref.finalize(self, _remove_spool, path)
+
+
+    def open(self) -> typing.BinaryIO:
+        return open(self.path, "rb")
+    
+
+    def read(self) -> bytes:
+        with self.open() as file:
+            return file.read()
+        
+
+    def __len__(self) -> int:
+        return os.stat(self.path).st_size
+    
+
+    def __repr__(self) -> str:
+        return f'<AttachmentSpool: "{self.path}">'
+
+
+def hash_file(path: "Path", chunk_size: int=PAYLOAD_CHUNK_SIZE) -> str:
+    """
+    USO INTERNO
+
+    calcula o hash sha256 (hexadecimal) de um arquivo lendo-o em blocos de `chunk_size` bytes, sem carregá-lo inteiro em memória.
+    """
+    sha = hashlib.sha256()
+    with path.file("rb") as file:
+        for chunk in iter_payload(file, chunk_size):
+            sha.update(chunk)
+
+    return sha.hexdigest()
+
+
+def _read_email(path: "Path", load: bool) -> typing.Optional[tuple[dict, str, dict[str, "Attachment"]]]:
     """
-    content = [
-        str(email.subject).strip().lower(),
-        str(email.content).strip().lower(),
-        str(email.sender).strip().lower(),
-        str(email.destination if isinstance(email.destination, list) else [email.destination]).strip().lower(),
-    ]
+    USO INTERNO
 
-    if email.date:
-        content.append(str(email.date).strip().lower())
-    sha = hashlib.sha256(str("".join(content)).encode()).hexdigest()
+    valida o e-mail salvo em `path` (metadados, hash do conteúdo e hashes dos anexos) lendo cada arquivo uma única vez.
+    retorna None quando o e-mail é inválido. quando `load` é True, os anexos lidos para a validação são devolvidos,
+    caso contrário os hashes são calculados em blocos, sem manter os anexos em memória.
+    somente os anexos listados nos metadados são considerados (outros arquivos no diretório são ignorados).
+
+    anexos grandes são devolvidos como mmap (somente leitura, sem descritor aberto): o mapeamento pertence ao Attachment
+    devolvido e é desfeito quando ele é liberado, ou antes disso com `attachment.payload.close()`.
+    """
+    meta_path = path.join("metadata.json")
+    metadata: METADATA = load_json(meta_path)
+
+    if not _METADATA_VALIDATOR.is_valid(metadata):
+        return None
+    
+    content_path = path.join("content" + metadata["extension"])
+    content: str
+    with content_path.file() as content_file:
+        content = content_file.read()
+
+    fields = (
+        metadata.get("subject", ""),
+        content,
+        metadata.get("sender", ""),
+        metadata.get("destination", ""),
+        metadata.get("date")
+    )
 
-    return sha
+    if _fields_hash(*fields) != metadata["hash"] and _fields_hash(*fields, legacy=True) != metadata["hash"]:
+        return None
+
+    hashes = {att["name"]: att["hash"] for att in metadata.get("attachments") or []}
+    attachments: dict[str, Attachment] = {}
+
+    if not load:
+        for name, digest in hashes.items():
+            att_path = path.join(name)
+            if not att_path.exists or hash_file(att_path) != digest:
+                return None
+            
+        return metadata, content, attachments
+
+    for name, digest in hashes.items():
+        att_path = path.join(name)
+        if not att_path.exists:
+            return None
+        
+        content_type = guess_type(name)
+        main_type, _, sub_type = content_type.partition("/")
+
+        with att_path.file("rb") as attachment:
+            # anexos grandes são mapeados em memória (páginas carregadas sob demanda), os pequenos são lidos de uma vez
+            # (trackfd=False: o mapeamento não mantém uma cópia do descritor, fechado ao sair do bloco)
+            if os.fstat(attachment.fileno()).st_size > ATTACHMENT_SPOOL_SIZE:
+                payload = mmap.mmap(attachment.fileno(), 0, access=mmap.ACCESS_READ, trackfd=False)
+            else:
+                payload = attachment.read()
+
+        # o hash é calculado sobre o conteúdo já lido, que também é devolvido
+        if hashlib.sha256(payload).hexdigest() != digest:
+            if isinstance(payload, mmap.mmap):
+                payload.close()
+            return None
+
+        attachments[name] = Attachment(content_type, main_type, sub_type, payload, digest)
+
+    return metadata, content, attachments
 
 
 def get_email_from(path: "Path") -> "Email":
@@ -110,34 +349,12 @@ def get_email_from(path: "Path") -> "Email":
         ))
     elif not path.exists:
         raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=str(path), TYPE="email"))
-    elif not is_valid_email_in(path):
-        raise InvalidEmailException(parse_message(INVALID_EMAIL, PATH=str(path)))
-        
-    meta_path = path.join("metadata.json")
-    metadata: METADATA
-    with meta_path.file() as meta:
-        metadata = json.load(meta)
 
-    content_path = path.join("content" + metadata["extension"])
-    content: str
-    with content_path.file() as content_file:
-        content = content_file.read()
-
-    attachments: dict[str, dict[typing.Literal["content_type", "payload", "main_type", "sub_type"], str]] = {}
-    att_paths = path.items(ignore=[meta_path.name, content_path.name])
-    for att_path in att_paths:
-        mime_type, _ = mimetypes.guess_type(str(att_path))
-        mime_type = mime_type or "application/octet-stream"
-        main_type, sub_type = mime_type.split("/")
-        content_type, _ = mimetypes.guess_type(str(att_path))
-
-        with att_path.file("rb") as attachment:
-            attachments[att_path.name] = {
-                "content_type": content_type,
-                "payload": attachment.read(),
-                "main_type": main_type,
-                "sub_type": sub_type
-            }
+    # os arquivos são lidos uma única vez: a validação (is_valid_email_in) e a leitura acontecem juntas
+    loaded = _read_email(path, load=True)
+    if loaded is None:
+        raise InvalidEmailException(parse_message(INVALID_EMAIL, PATH=str(path)))
+    metadata, content, attachments = loaded
 
     email = Email(
         destination=metadata["destination"],
@@ -145,7 +362,7 @@ def get_email_from(path: "Path") -> "Email":
         subject=metadata["subject"],
         content=content,
         date=metadata["date"],
-        attachments=attachments
+        **attachments
     )
 
     return email
@@ -185,49 +402,7 @@ def is_valid_email_in(path: "Path") -> bool:
     elif not path.exists:
         raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=str(path), TYPE="email"))
     
-    meta = path.join("metadata.json")
-    metadata: dict
-    with meta.file() as metafile:
-        metadata = json.load(metafile)
-
-    try:
-        jsonschema.validate(metadata, _METADATA_SCHEME_JSON)
-    except jsonschema.ValidationError:
-        return False
-    
-    attachments: list[dict[str, str]] = metadata.get("attachments")
-    if attachments:
-        for att in attachments:
-            name = att["name"]
-            att_path = path.join(name)
-            
-            if not os.path.exists(att_path):
-                return False
-            
-            with att_path.file("rb") as file:
-                if not hashlib.sha256(file.read()) == att["hash"]:
-                    return False
-    
-    extension: str = metadata["extension"]
-
-    content_path = path.join("content" + extension)
-    content: str
-    with content_path.file() as content_file:
-        content = content_file.read()
-
-    content_hash = [
-        str(metadata.get("subject", "")).strip().lower(),
-        content.strip().lower(),
-        str(metadata.get("sender", "")).strip().lower(),
-        str(metadata.get("destination", "")).strip().lower()
-    ]
-
-    if metadata.get("date"):
-        content_hash.append(str(metadata["date"]).strip().lower())
-
-    sha = hashlib.sha256(str("".join(content_hash)).encode()).hexdigest()
-
-    return sha == metadata["hash"]
+    return _read_email(path, load=False) is not None
 
 
 class Path:
@@ -276,15 +451,21 @@ class Path:
         print(file) # "./project_name/directory/subdirectory/file.txt"
     """
 
-    __slots__ = ["_paths"]
+    __slots__ = ["_paths", "_str"]
 
     def __init__(self, *paths: str):
-        self._paths = Path._parse_path(paths)
+        self._set_paths(Path._parse_path(paths))
+
+
+    def _set_paths(self, paths: list[str]|tuple[str, ...]):
+        # os componentes são imutáveis (tupla), então o caminho completo (str) é montado somente quando usado e reaproveitado até que sejam substituídos
+        self._paths = tuple(paths)
+        self._str = None
 
 
     @staticmethod
     def _parse_path(paths: str|tuple[str]) -> list[str]:
-        paths = list(str(p) for p in paths) if isinstance(paths, (tuple, list)) else [str(paths)]
+        paths = [str(p) for p in paths] if isinstance(paths, (tuple, list)) else [str(paths)]
         return paths
     
 
@@ -318,20 +499,16 @@ class Path:
 
         new_components = []
         for comp in components:
-            comp = re.sub(
-                r"[^\w\-_/\\.]",
-                "_",
-                comp
-            )
+            comp = _UNSAFE_CHARS.sub("_", comp)
 
             new_components.append(comp)
 
-        new_paths = new_components if full else self._paths[:-1] + new_components
+        new_paths = new_components if full else [*self._paths[:-1], *new_components]
 
         if not in_self:
             return Path(*new_paths)
         
-        self._paths = new_paths
+        self._set_paths(new_paths)
 
 
     @typing.overload
@@ -365,7 +542,7 @@ class Path:
             path = Path(*paths)
             return path
         
-        self._paths = paths
+        self._set_paths(paths)
     
 
     @property
@@ -382,7 +559,15 @@ class Path:
             else:
                 print(f'o arquivo "{path.name}" ({str(path)}) não existe!') # o arquivo "file.txt" (./project_name/directory/) existe!
         """
-        return os.path.exists(str(self))
+        return self._stat() is not None
+    
+
+    def _stat(self) -> typing.Optional[os.stat_result]:
+        # uma única chamada de sistema informa a existência e o tipo do componente (mesmos erros ignorados por os.path.exists)
+        try:
+            return os.stat(str(self))
+        except (OSError, ValueError):
+            return None
     
 
     def file(self, mode: _OPEN_TEXT_MODE="r", non_existent_ok: bool=False) -> TextIOWrapper:
@@ -405,10 +590,13 @@ class Path:
         #     raise 
         if not mode in OPEN_TEXT_MODE:
             raise UnexpectedValueException(parse_message(INVALID_OPEN_TEXT_MODE, MODE=mode))
-        elif not self.exists:
+
+
+        path_stat = self._stat()
+        if path_stat is None:
             if not non_existent_ok:
                 raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=str(self), TYPE="file"))
-        elif not self.is_type("file"):
+        elif stat.S_ISDIR(path_stat.st_mode):
             raise NotADirectoryError(parse_message(NOT_FILE, PATH=str(self)))
         
         return open(str(self), mode)
@@ -445,7 +633,7 @@ class Path:
             for file in files:
                 print(file.name) # "file1.txt" / "file2.txt"
         """
-        if not isinstance(ignore, list):
+        if ignore is not None and not isinstance(ignore, list):
             raise UnexpectedTypeException(parse_message(
                 UNEXPECTED_TYPE,
                 METHOD="Path.items(...)",
@@ -453,19 +641,27 @@ class Path:
                 PARAMETER="ignore",
                 RECEIVED=f"{type(ignore).__name__} ({ignore})"
             ))
-        elif not self.exists:
+
+
+        # os erros de os.scandir já informam se o diretório não existe ou se não é um diretório (sem verificações prévias)
+        base = str(self)
+        try:
+            entries = os.scandir(base)
+        except FileNotFoundError:
             raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=self, TYPE="directory"))
-        elif not self.is_type("directory"):
+        except NotADirectoryError:
             raise NotDirectoryException(parse_message(NOT_DIRECTORY, PATH=self))
         
-        items_name = os.listdir(str(self))
         items = []
-        for item_name in items_name:
-            if ignore and item_name in ignore:
-                continue
-                
-            item = Path(str(self), item_name)
-            items.append(item)
+        with entries:
+            for entry in entries:
+                if ignore and entry.name in ignore:
+                    continue
+                    
+                # o caminho completo já montado por os.scandir é reaproveitado (Path.__str__ não precisa montá-lo)
+                item = Path(base, entry.name)
+                item._str = entry.path
+                items.append(item)
 
         return items
     
@@ -499,16 +695,13 @@ class Path:
                     directory/
             '''
         """
-        if os.path.exists(str(self)):
+        if self.exists:
             if exists_ok:
                 return
             raise PathExistsException(parse_message(DIRECTORY_ALREADY_EXISTS, PATH=str(self)))
         
-        path = ""
-        for p in self._paths:
-            path = os.path.join(path, p)
-
-            os.makedirs(path, exist_ok=exists_ok)
+        # os.makedirs já cria todos os diretórios intermediários
+        os.makedirs(str(self), exist_ok=exists_ok)
         
 
     @typing.overload
@@ -534,7 +727,7 @@ class Path:
             print(file1) # "./project_name/directory/file.txt"
 
             file2 = path.free_name("file.txt",) # adiciona outro componente com o mesmo nome de um componente já existente
-            print(file2) # "./project_name/directory/file_0.txt"
+            print(file2) # "./project_name/directory/file_2.txt"
         """
         paths = [str(self)] + Path._parse_path(paths)
         path = Path(*paths)
@@ -543,21 +736,31 @@ class Path:
         if parser:
             path.parser(in_self=True, full=False)
 
-        if path.exists:
-            ext = ""
-            if path.is_type("file"):
-                if "." in path.name:
-                    ext = "." + path.name.split(".")[-1]
-            
-            counter = 2
-            name = path.name[:-len(ext)] if ext else path.name
-            while path.exists:
-                name += f"_{counter}"
+        path_stat = path._stat()
+        if path_stat is not None:
+            name, ext = path.name, ""
+            if not stat.S_ISDIR(path_stat.st_mode):
+                name, ext = os.path.splitext(path.name)
 
-                path._paths[-1] = name + ext
-                path.parser(in_self=True, full=False)
+            def candidate(counter: int) -> Path:
+                free = Path(*path._paths[:-1], f"{name}_{counter}{ext}")
+                free.parser(in_self=True, full=False)
+                return free
             
-            return path
+            # busca exponencial seguida de busca binária pelo menor contador livre ("nome_2", "nome_3", ...):
+            # O(log n) verificações quando há muitos componentes com o mesmo nome
+            occupied, free = 1, 2
+            while candidate(free).exists:
+                occupied, free = free, free * 2
+
+            while free - occupied > 1:
+                middle = (occupied + free) // 2
+                if candidate(middle).exists:
+                    occupied = middle
+                else:
+                    free = middle
+            
+            return candidate(free)
 
         return path
     
@@ -571,11 +774,14 @@ class Path:
     def is_type(self, expected: typing.Literal["directory", "file"]=None) -> bool|typing.Literal["directory", "file"]:
         if expected and expected not in ["directory", "file"]:
             raise UnexpectedValueException(parse_message(UNEXPECTED_EXPECTED, EXPECTED=expected))
-        elif not self.exists:
+
+
+        path_stat = self._stat()
+        if path_stat is None:
             if expected is None:
                 raise PathNotFoundException(parse_message(PATH_NOT_FOUND, PATH=str(self), TYPE="path"))
             return False
-        typ = "directory" if os.path.isdir(str(self)) else "file"
+        typ = "directory" if stat.S_ISDIR(path_stat.st_mode) else "file"
             
         return typ == expected if expected else typ
 
@@ -710,8 +916,7 @@ class Path:
         if not self.exists:
             raise PathNotFoundException(parse_message(PATH_NOT_FOUND, TYPE="path", PATH=str(self)))
         
-        new_path = Path(*self._paths)
-        new_path._paths[-1] = str(new_name)
+        new_path = Path(*self._paths[:-1], str(new_name))
         
         if new_path.exists:
             typ = new_path.is_type()
@@ -719,7 +924,7 @@ class Path:
         
         os.rename(str(self), str(new_path))
 
-        self._paths = new_path._paths
+        self._set_paths(new_path._paths)
 
 
     @property
@@ -737,7 +942,9 @@ class Path:
 
 
     def __str__(self) -> str:
-        return os.path.join(*self._paths)
+        if self._str is None:
+            self._str = os.path.join(*self._paths)
+        return self._str
     
 
     def __repr__(self) -> typing.Literal['<Path: "<path>">']:
@@ -745,9 +952,10 @@ class Path:
     
 
 class Report:
-    def __init__(self, status: str, error: list[Email]=[]):
+    def __init__(self, status: str, error: typing.Optional[list["Email"]]=None):
+        # cada relatório tem sua própria lista (send acrescenta os e-mails que falharam)
         self.status = status
-        self.error = error
+        self.error = error if error is not None else []
 
     
     def __str__(self):
@@ -1,8 +1,8 @@
 import hashlib
-from typing import Literal, Optional
+from typing import Optional, Callable, NamedTuple, BinaryIO
 
 from ..core.types import UserModel
-from ..core.utils import parse_message
+from ..core.utils import parse_message, Path
 from ..core.messeger import UNEXPECTED_TYPE
 from ..exceptions import UnexpectedTypeException
 
@@ -18,10 +18,29 @@ def _raiser_UTE(e, p, i, t):
         ))
 
 
+class Attachment(NamedTuple):
+    """
+    anexo de um e-mail recebido (registro imutável e sem dicionário por instância).
+
+    ### atributos:
+
+        content_type (str): tipo MIME completo do anexo ("image/png", ...)
+        main_type (str): tipo principal ("image")
+        sub_type (str): subtipo ("png")
+        payload (bytes|BinaryIO|AttachmentSpool): conteúdo do anexo, em memória, mapeado de um arquivo salvo (mmap, anexos grandes carregados por get_email_from) ou em um arquivo temporário aberto sob demanda (anexos recebidos grandes)
+        sha256 (str|None): hash sha256 (hexadecimal) do conteúdo, quando já calculado na recepção
+    """
+    content_type: str
+    main_type: str
+    sub_type: str
+    payload: "bytes|BinaryIO|AttachmentSpool"
+    sha256: Optional[str] = None
+
+
 class Email:
-    __slots__ = ["sender", "subject", "content", "attachments", "destination", "date", "rid", "user"]
+    __slots__ = ["sender", "subject", "_content", "_content_bytes", "_content_charset", "_attachments", "_raw", "destination", "date", "rid", "user"]
 
-    def __init__(self, destination: str|list[str], user: Optional[UserModel]=None, sender: Optional[str]=None, subject: Optional[str]=None, content: Optional[str]=None, date: Optional[str]=None, **attachments: dict[str, dict[Literal["content_type", "payload", "main_type", "sub_type"], str]]):
+    def __init__(self, destination: str|list[str], user: Optional[UserModel]=None, sender: Optional[str]=None, subject: Optional[str]=None, content: Optional[str]=None, date: Optional[str]=None, **attachments: str|Path|Attachment):
         _raiser_UTE("str|list[str]", "destination", destination, (str, list))
         if user: _raiser_UTE("UserModel", "user", user, UserModel)
         if sender: _raiser_UTE("str", "sender", sender, str)
@@ -29,8 +48,10 @@ class Email:
         if content: _raiser_UTE("str", "content", content, str)
         if date: _raiser_UTE("str", "date", date, str)
         if attachments: 
-            for name, att in attachments.items: _raiser_UTE("dict", name, att, dict)
+            # e-mails enviados recebem caminhos dos arquivos; recebidos e carregados (get_email_from), instâncias de Attachment
+            for name, att in attachments.items(): _raiser_UTE("str|Path|Attachment", name, att, (str, Path, Attachment))
         
+        self._raw = None
         self.destination = destination
         self.user = user.copy() if user else None
         self.sender = f"{user.temp_name} <{user.temp_email}>" if user else sender
@@ -40,7 +61,93 @@ class Email:
         self.attachments = attachments or {}
 
         self.gen_rid()
+
+
+    @property
+    def content(self) -> Optional[str]:
+        self._load_raw()
+
+        # conteúdos recebidos são decodificados somente quando acessados
+        if self._content is None and self._content_bytes is not None:
+            try:
+                self._content = self._content_bytes.decode(self._content_charset, errors="replace")
+            except LookupError:
+                # codificação declarada desconhecida pelo Python: registra a codificação realmente usada (content_bytes depende dela)
+                self._content_charset = "utf-8"
+                self._content = self._content_bytes.decode("utf-8", errors="replace")
+        return self._content
+    
+
+    @content.setter
+    def content(self, content: Optional[str]):
+        self._load_raw()
+        self._content = content
+        self._content_bytes = None
+        self._content_charset = "utf-8"
+
+
+    @property
+    def content_bytes(self) -> Optional[bytes]:
+        """
+        conteúdo do e-mail codificado em UTF-8, reaproveitando os bytes recebidos quando possível.
+        """
+        self._load_raw()
+        if self._content_bytes is not None and self._content_charset in ("utf-8", "us-ascii"):
+            # bytes inválidos não são reaproveitados: não corresponderiam a `content`, decodificado com substituições ("\ufffd")
+            try:
+                content = self._content_bytes.decode(self._content_charset)
+            except UnicodeDecodeError:
+                pass
+            else:
+                if self._content is None:
+                    self._content = content
+                return self._content_bytes
+        
+        content = self.content
+        return content.encode("utf-8") if content is not None else None
+
+
+    @property
+    def attachments(self) -> dict[str, str|Path|Attachment]:
+        self._load_raw()
+        return self._attachments
+    
+
+    @attachments.setter
+    def attachments(self, attachments: dict[str, str|Path|Attachment]):
+        self._load_raw()
+        self._attachments = attachments
+
+
+    def set_raw(self, data: bytes, parser: Callable[[bytes], tuple[Optional[bytes], Optional[str], dict]]):
+        """
+        (USO INTERNO) adia a interpretação do corpo de um e-mail recebido até que `content` ou `attachments` sejam acessados.
+
+        ### parâmetros:
+
+            data (bytes): e-mail recebido, sem interpretação
+            parser (Callable): função que extrai (conteúdo, codificação, anexos) de `data`
+        """
+        self._raw = (data, parser)
+
+
+    def _load_raw(self):
+        raw = self._raw
+        if raw is None:
+            return
         
+        data, parser = raw
+        content, charset, attachments = parser(data)
+
+        # outra thread pode ter concluído a interpretação enquanto esta acontecia
+        if self._raw is raw:
+            self._attachments = attachments
+            if content is not None:
+                self._content = None
+                self._content_bytes = content
+                self._content_charset = (charset or "utf-8").lower()
+            self._raw = None
+
 
     def gen_rid(self):
         self.rid = hashlib.sha256(
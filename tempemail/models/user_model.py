@@ -58,9 +58,7 @@ class UserModel:
     
 
     def _gen_anonymous_name(name: str=DEFAULT_NAME, add_time: bool=True, ranger: int=10) -> str:
-        name = DEFAULT_NAME + "_"
-        for _ in range(ranger):
-            name += str(rd.choice(_CHARS))
+        name = DEFAULT_NAME + "_" + "".join(rd.choices(_CHARS, k=ranger))
 
         if add_time:
             name += f"_{time.time()}"
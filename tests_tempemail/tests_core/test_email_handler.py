@@ -1,6 +1,23 @@
+import os
+import re
+import errno
+import base64
+import hashlib
+import socket
+import smtplib
+import asyncio
 import pytest
-
-from tempemail import EmailHandler, UserModel, Path, EnvHandler, Email, is_valid_email_in
+from typing import Optional
+from email import message_from_bytes, policy
+from email.message import EmailMessage, Message
+from aiosmtpd.smtp import Envelope
+from aiosmtpd.controller import Controller
+
+from tempemail import EmailHandler, UserModel, Path, EnvHandler, Email, is_valid_email_in, get_email_from
+from tempemail.core.email_handler import _Handler, _header, _ReusePortController, _DataWriter, _decode_attachment, _parse_body, _set_text_content, _stream_message, _destination_name, _copy_file, _new_spool
+from tempemail.core.utils import AttachmentSpool, parse_message
+from tempemail.core.messeger import ATTACHMENT_SPOOL_SIZE, MAX_DESTINATION_NAME, TRIGGER_ATTEMPTS, SAVE_FAILED, SAVE_BATCH_SIZE
+from tempemail.exceptions import UnexpectedTypeException, UnexpectedValueException
 
 from tests_tempemail.conftest import configure_env
 
@@ -40,6 +57,195 @@ def test__email_handler__send(handler: EmailHandler):
         assert handler.send(email()).status == "250 FULL-SUCCESSFUL"
 
 
+@pytest.mark.asyncio
+async def test__email_handler__send__smtp_error(handler: EmailHandler, monkeypatch: pytest.MonkeyPatch):
+    rcpt = smtplib.SMTP.rcpt
+    def refuse(smtp, address, *args, **kwargs):
+        if address == "dest2@localhost.com":
+            return 550, b"refused"
+        return rcpt(smtp, address, *args, **kwargs)
+    monkeypatch.setattr(smtplib.SMTP, "rcpt", refuse)
+
+    with handler:
+        refused = email(2)
+        report = handler.send([email(1), refused, email(3)])
+        assert report.status == "200 OK"
+        assert report.error == [refused]
+
+        emails = handler.wait_emails(repeat=2, timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert sorted(subjects) == ["Test Subject 1", "Test Subject 3"]
+
+
+@pytest.mark.asyncio
+async def test__email_handler__send__failed_data(handler: EmailHandler, monkeypatch: pytest.MonkeyPatch):
+    flush = _DataWriter.flush
+    def fail(writer):
+        if b"test content 1" in writer._buffer:
+            raise OSError("connection reset")
+        flush(writer)
+    monkeypatch.setattr(_DataWriter, "flush", fail)
+
+    with handler:
+        failed = email(1)
+        report = handler.send([failed, email(2)])
+        assert report.status == "200 OK"
+        assert report.error == [failed]
+
+        assert handler.send(email(3)).status == "250 FULL-SUCCESSFUL"
+
+        emails = handler.wait_emails(repeat=2, timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert sorted(subjects) == ["Test Subject 2", "Test Subject 3"]
+
+
+def test__stream_message__data_refused():
+    class SMTP:
+        def __init__(self):
+            self.commands = []
+
+        def ehlo_or_helo_if_needed(self): ...
+        def mail(self, address): return 250, b"OK"
+        def rcpt(self, address): return 250, b"OK"
+        def putcmd(self, command): self.commands.append(command)
+        def getreply(self): return 554, b"refused"
+        def rset(self): self.commands.append("rset")
+
+    smtp = SMTP()
+    message = EmailMessage()
+    message["From"] = "send@localhost.com"
+    message["To"] = "dest@localhost.com"
+
+    with pytest.raises(smtplib.SMTPDataError):
+        _stream_message(smtp, message)
+    assert smtp.commands == ["data", "rset"]
+
+
+def test__stream_message__failure_after_data(handler: EmailHandler, monkeypatch: pytest.MonkeyPatch):
+    def fail(writer):
+        raise OSError("connection reset")
+    monkeypatch.setattr(_DataWriter, "flush", fail)
+
+    with handler:
+        smtp = smtplib.SMTP("localhost", 1025)
+        with pytest.raises(OSError):
+            _stream_message(smtp, handler._get_handler(email(1)))
+
+        # o DATA inacabado não é reaproveitado
+        assert smtp.sock is None
+
+
+@pytest.mark.asyncio
+async def test__email_handler__send_async(handler: EmailHandler):
+    with handler:
+        report = await handler.send_async([email(1), email(2), email(3)], connections=2)
+        assert report.status == "250 FULL-SUCCESSFUL"
+        assert len(report) == 0
+
+        emails = handler.wait_emails(repeat=3, timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert sorted(subjects) == ["Test Subject 1", "Test Subject 2", "Test Subject 3"]
+
+
+@pytest.mark.asyncio
+async def test__email_handler__send_async__smtp_error(handler: EmailHandler, monkeypatch: pytest.MonkeyPatch):
+    rcpt = smtplib.SMTP.rcpt
+    def refuse(smtp, address, *args, **kwargs):
+        if address == "dest2@localhost.com":
+            return 550, b"refused"
+        return rcpt(smtp, address, *args, **kwargs)
+    monkeypatch.setattr(smtplib.SMTP, "rcpt", refuse)
+
+    flush = _DataWriter.flush
+    def fail(writer):
+        if b"test content 4" in writer._buffer:
+            raise OSError("connection reset")
+        flush(writer)
+    monkeypatch.setattr(_DataWriter, "flush", fail)
+
+    with handler:
+        # uma única conexão: a recusa e a queda no meio do DATA não interrompem os e-mails seguintes
+        refused, dropped = email(2), email(4)
+        report = await handler.send_async([email(1), refused, email(3), dropped, email(5)], connections=1)
+        assert report.status == "200 OK"
+        assert report.error == [refused, dropped]
+
+        emails = handler.wait_emails(repeat=3, timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert sorted(subjects) == ["Test Subject 1", "Test Subject 3", "Test Subject 5"]
+
+
+@pytest.mark.asyncio
+async def test__email_handler__send_async__connections(handler: EmailHandler):
+    with pytest.raises(UnexpectedValueException):
+        await handler.send_async(email(), connections=0)
+
+
+@pytest.mark.asyncio
+async def test__email_handler__send_template(handler: EmailHandler):
+    with handler:
+        report = handler.send_template(email(1), [
+            {"destination": "dest1@localhost.com"},
+            {"destination": "dest2@localhost.com", "subject": "Test Subject 2"}
+        ])
+        assert report.status == "250 FULL-SUCCESSFUL"
+
+        emails = handler.wait_emails(repeat=2, timeout=0.5, raiser=False)
+        received = {_email.destination[0]: _email async for _email in emails}
+
+        assert received["dest1@localhost.com"].subject == "Test Subject 1"
+        assert received["dest2@localhost.com"].subject == "Test Subject 2"
+        assert received["dest2@localhost.com"].content == "test content 1"
+
+
+@pytest.mark.asyncio
+async def test__email_handler__workers(env: EnvHandler, test_env: Path):
+    configure_env(test_env)
+    handler = EmailHandler(env, workers=3)
+
+    with handler:
+        report = await handler.send_async([email(i) for i in range(1, 7)], connections=3)
+        assert report.status == "250 FULL-SUCCESSFUL"
+
+        emails = handler.wait_emails(repeat=6, timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert sorted(subjects) == [f"Test Subject {i}" for i in range(1, 7)]
+
+
+@pytest.mark.parametrize("error", [None, socket.timeout("timed out")])
+def test__reuse_port_controller__trigger_server(monkeypatch: pytest.MonkeyPatch, error: Optional[Exception]):
+    attempts = []
+    def trigger_server(self):
+        # a conexão de teste é atendida por outro controlador (ou expira), então a fábrica deste nunca é chamada
+        attempts.append(self)
+        if error is not None:
+            raise error
+    monkeypatch.setattr(Controller, "_trigger_server", trigger_server)
+
+    controller = _ReusePortController(_Handler(), "localhost", 1025)
+    try:
+        with pytest.raises(TimeoutError, match=f"after {TRIGGER_ATTEMPTS} test connections") as raised:
+            controller._trigger_server()
+    finally:
+        controller.loop.close()
+
+    assert len(attempts) == TRIGGER_ATTEMPTS
+    assert raised.value.__cause__ is error
+
+
+@pytest.mark.asyncio
+async def test__email_handler__max_emails(env: EnvHandler, test_env: Path):
+    configure_env(test_env)
+    handler = EmailHandler(env, max_emails=2)
+
+    with handler:
+        handler.send([email(1), email(2), email(3)])
+
+        emails = handler.wait_emails(timeout=0.5, raiser=False)
+        subjects = [_email.subject async for _email in emails]
+        assert subjects == ["Test Subject 2", "Test Subject 3"]
+
+
 @pytest.mark.asyncio
 async def test__email_handler__wait_emails__address_any(handler: EmailHandler):
     with handler:
@@ -66,6 +272,36 @@ async def test__email_handler__wait_emails__address_specific(handler: EmailHandl
             assert _email.content == "test content 2"
 
 
+@pytest.mark.asyncio
+async def test__email_handler__send__attachments(handler: EmailHandler, data_to_tests: Path):
+    attachment = data_to_tests.join("document.pdf")
+    with attachment.file("wb", non_existent_ok=True) as file:
+        file.write(b"%PDF attachment")
+
+    mail = Email(
+        destination="dest@localhost.com",
+        sender="send@localhost.com",
+        subject="Test Subject",
+        content="test content",
+        document=str(attachment),
+        other=attachment
+    )
+
+    with handler:
+        assert handler.send(mail).status == "250 FULL-SUCCESSFUL"
+
+        emails = handler.wait_emails(repeat=1, timeout=0.5, raiser=False)
+        received = [_email async for _email in emails]
+
+    assert received[0].attachments["document"].payload == b"%PDF attachment"
+    assert received[0].attachments["other"].content_type == "application/pdf"
+
+
+def test__email__attachments__unexpected_type():
+    with pytest.raises(UnexpectedTypeException):
+        Email(destination="dest@localhost.com", document=b"bytes")
+
+
 @pytest.mark.asyncio
 async def test__email_handler__save_in(data_to_tests: Path, handler: EmailHandler):
     path = data_to_tests.join("emails")
@@ -101,4 +337,384 @@ async def test__email_handler__save_in(data_to_tests: Path, handler: EmailHandle
     with content_path.file() as content:
         assert content.read() == "test content 1"
 
-    assert is_valid_email_in(email_1_subject)
\ No newline at end of file
+    assert is_valid_email_in(email_1_subject)
+
+
+def test__email_handler__close__pending_saves(data_to_tests: Path, handler: EmailHandler):
+    path = data_to_tests.join("emails")
+    handler.save_in(path)
+
+    handler.open()
+    handler.send(email(1))
+    # o e-mail é salvo em segundo plano depois da resposta 250: close() aguarda os salvamentos pendentes
+    handler.close()
+
+    assert is_valid_email_in(path.join("dest1_localhost.com", "Test_Subject_1"))
+
+
+def test__email_handler__save_batches(data_to_tests: Path, handler: EmailHandler, monkeypatch: pytest.MonkeyPatch):
+    batches = []
+    save_batch = _Handler.save_batch
+    def counting_save_batch(self, emails: list[Email]):
+        batches.append(len(emails))
+        return save_batch(self, emails)
+    monkeypatch.setattr(_Handler, "save_batch", counting_save_batch)
+
+    path = data_to_tests.join("emails")
+    handler.save_in(path)
+    total = SAVE_BATCH_SIZE * 2 + 3
+
+    with handler:
+        handler.send([email(1) for _ in range(total)])
+
+    # uma rajada maior que um lote é dividida em vários lotes, e todos são salvos antes de close() retornar
+    assert sum(batches) == total
+    assert max(batches) <= SAVE_BATCH_SIZE
+
+    saved = path.join("dest1_localhost.com").items()
+    assert len(saved) == total
+    assert all(is_valid_email_in(subject) for subject in saved)
+
+
+@pytest.mark.asyncio
+async def test__handler__save_failed(data_to_tests: Path, monkeypatch: pytest.MonkeyPatch):
+    error = OSError(errno.ENOSPC, "No space left on device")
+    def save_in(self, email_path: Path, email: Email):
+        raise error
+    monkeypatch.setattr(_Handler, "_save_in", save_in)
+
+    errors = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+    handler = await receive(data_to_tests.join("emails"), raw_envelope(b"test content"))
+
+    # a resposta ao cliente SMTP já foi enviada, então a falha chega ao tratador de exceções do loop
+    assert errors == [{
+        "message": parse_message(SAVE_FAILED, RID=handler.emails[0].rid),
+        "exception": error
+    }]
+
+
+def envelope(attachment: bytes) -> Envelope:
+    message = EmailMessage()
+    message["From"] = "send@localhost.com"
+    message["To"] = "dest@localhost.com"
+    message["Subject"] = "Test Subject"
+    message["Date"] = "Thu, 01 Jan 2026 00:00:00 +0000"
+    message.set_content("test content")
+    message.add_attachment(attachment, maintype="application", subtype="pdf", filename="doc")
+
+    data = Envelope()
+    data.content = message.as_bytes()
+    data.mail_from = "send@localhost.com"
+    data.rcpt_tos = ["dest@localhost.com"]
+    return data
+
+
+@pytest.mark.asyncio
+async def test__email_handler__large_attachments__file_descriptors(data_to_tests: Path):
+    resource = pytest.importorskip("resource")
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("requires /proc/self/fd")
+
+    path = data_to_tests.join("emails")
+    path.mkdir(True)
+    handler = _Handler()
+    handler.path = path
+
+    attachment = os.urandom(ATTACHMENT_SPOOL_SIZE + 1024)
+    data = envelope(attachment)
+
+    errors = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+
+    # mais e-mails com anexos grandes do que descritores disponíveis
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = len(os.listdir("/proc/self/fd")) + 32
+    total = limit + 16
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    try:
+        for _ in range(total):
+            await handler.handle_DATA(None, None, data)
+        for queue, _ in handler._save_workers.values():
+            await queue.join()
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        for _, task in handler._save_workers.values():
+            task.cancel()
+
+    assert errors == []
+
+    saved = path.join("dest_localhost.com").items()
+    assert len(saved) == total
+    assert all(is_valid_email_in(subject) for subject in saved)
+    assert all(email.attachments["doc"].payload.read() == attachment for email in handler.emails)
+
+
+def copy_spool(data_to_tests: Path, content: bytes) -> tuple[bool, bytes]:
+    file, spool = _new_spool()
+    with file:
+        file.write(content)
+
+    data_to_tests.mkdir(True)
+    target = str(data_to_tests.join("copy.bin"))
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+    try:
+        copied = _copy_file(spool, fd)
+    finally:
+        os.close(fd)
+
+    with open(target, "rb") as file:
+        return copied, file.read()
+
+
+def test__copy_file(data_to_tests: Path):
+    if not hasattr(os, "sendfile"):
+        pytest.skip("requires os.sendfile")
+
+    content = os.urandom(3 * 1024 * 1024 + 7)
+    assert copy_spool(data_to_tests, content) == (True, content)
+
+
+def test__copy_file__fallback(data_to_tests: Path, monkeypatch: pytest.MonkeyPatch):
+    def unsupported(*args):
+        raise OSError(errno.EINVAL, "Invalid argument")
+    monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+    assert copy_spool(data_to_tests, b"content") == (False, b"")
+
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    assert copy_spool(data_to_tests, b"content") == (False, b"")
+
+
+@pytest.mark.asyncio
+async def test__email_handler__save_in__sendfile_fallback(data_to_tests: Path, monkeypatch: pytest.MonkeyPatch):
+    def unsupported(*args):
+        raise OSError(errno.EINVAL, "Invalid argument")
+    monkeypatch.setattr(os, "sendfile", unsupported, raising=False)
+
+    path = data_to_tests.join("emails")
+    path.mkdir(True)
+    handler = _Handler()
+    handler.path = path
+
+    attachment = os.urandom(ATTACHMENT_SPOOL_SIZE * 3)
+    await handler.handle_DATA(None, None, envelope(attachment))
+    for queue, task in handler._save_workers.values():
+        await queue.join()
+        task.cancel()
+
+    subject = path.join("dest_localhost.com", "Test_Subject")
+    with subject.join("doc.pdf").file("rb") as file:
+        assert file.read() == attachment
+    assert is_valid_email_in(subject)
+
+
+def base64_part(data: bytes, line: int=76, padding: bool=True) -> Message:
+    encoded = base64.b64encode(data).decode()
+    if not padding:
+        encoded = encoded.rstrip("=")
+
+    part = Message()
+    part["Content-Type"] = "application/pdf"
+    part["Content-Transfer-Encoding"] = "base64"
+    part.set_payload("\r\n".join(encoded[i:i + line] for i in range(0, len(encoded), line)))
+    return part
+
+
+@pytest.mark.parametrize("size", [ATTACHMENT_SPOOL_SIZE - 3, ATTACHMENT_SPOOL_SIZE + 1, ATTACHMENT_SPOOL_SIZE + 2, ATTACHMENT_SPOOL_SIZE + 3])
+@pytest.mark.parametrize("line", [76, 75, 77, 1001])
+@pytest.mark.parametrize("padding", [True, False])
+def test__decode_attachment__base64(size: int, line: int, padding: bool):
+    part = base64_part(os.urandom(size), line, padding)
+    expected = part.get_payload(decode=True)
+
+    payload, digest = _decode_attachment(part)
+    if isinstance(payload, AttachmentSpool):
+        payload = payload.read()
+        assert digest == hashlib.sha256(expected).hexdigest()
+
+    assert payload == expected
+
+
+def test__destination_name__short():
+    assert _destination_name("dest@localhost.com") == "dest@localhost.com"
+    assert _destination_name(["dest@localhost.com"]) == "dest@localhost.com"
+    assert _destination_name(["dest1@localhost.com", "dest2@localhost.com"]) == "dest1@localhost.comdest2@localhost.com"
+
+
+def test__destination_name__long(data_to_tests: Path):
+    destination = [f"destination{i}@localhost.com" for i in range(10)]
+    name = _destination_name(destination)
+
+    assert len(name) <= MAX_DESTINATION_NAME
+    assert name == _destination_name(list(destination))
+
+    directory = Path(name).parser(full=False).name
+    assert re.fullmatch(r"[\w\-.]+", directory)
+
+    data_to_tests.mkdir(True)
+    os.mkdir(str(data_to_tests.join(directory)))
+    assert data_to_tests.join(directory).exists
+
+
+def test__destination_name__long_collision():
+    prefix = "d" * MAX_DESTINATION_NAME
+
+    assert _destination_name(f"{prefix}1@localhost.com") != _destination_name(f"{prefix}2@localhost.com")
+    assert _destination_name([prefix + "@localhost.com", "dest1@localhost.com"]) != _destination_name([prefix + "@localhost.com", "dest2@localhost.com"])
+
+
+def raw_envelope(body: bytes, headers: bytes=b"Content-Type: text/plain; charset=utf-8\r\n") -> Envelope:
+    data = Envelope()
+    data.content = (
+        b"From: send@localhost.com\r\n"
+        b"To: dest@localhost.com\r\n"
+        b"Subject: Test Subject\r\n"
+        b"Date: Thu, 01 Jan 2026 00:00:00 +0000\r\n"
+        + headers + b"\r\n" + body
+    )
+    data.mail_from = "send@localhost.com"
+    data.rcpt_tos = ["dest@localhost.com"]
+    return data
+
+
+async def receive(path: Path, *envelopes: Envelope) -> _Handler:
+    path.mkdir(True)
+    handler = _Handler()
+    handler.path = path
+
+    for data in envelopes:
+        await handler.handle_DATA(None, None, data)
+    for queue, task in handler._save_workers.values():
+        await queue.join()
+        task.cancel()
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test__handler__removed_destination(data_to_tests: Path):
+    path = data_to_tests.join("emails")
+    handler = await receive(path, raw_envelope(b"test content"))
+
+    destination = path.join("dest_localhost.com")
+    assert handler._dirs == {str(destination)}
+    # os diretórios já criados pertencem a cada receptor
+    assert _Handler()._dirs == set()
+
+    # o diretório do destinatário é removido entre dois e-mails: somente ele é recriado
+    destination.remove()
+    assert handler.save_batch([handler.emails[0]]) == [None]
+
+    assert handler._dirs == {str(destination)}
+    assert is_valid_email_in(destination.join("Test_Subject"))
+
+
+@pytest.mark.asyncio
+async def test__handler__free_names(data_to_tests: Path):
+    path = data_to_tests.join("emails")
+    path.join("dest_localhost.com", "Test_Subject").mkdir(True)
+
+    message = EmailMessage()
+    message["From"] = "send@localhost.com"
+    message["To"] = "dest@localhost.com"
+    message["Subject"] = "Test Subject"
+    message["Date"] = "Thu, 01 Jan 2026 00:00:00 +0000"
+    message.set_content("test content")
+    # "content" e "content_2" resultam em "content.txt" e "content_2.txt", ambos já ocupados quando são salvos
+    message.add_attachment("first attachment", filename="content")
+    message.add_attachment("second attachment", filename="content_2")
+    message.add_attachment(b"{}", maintype="application", subtype="json", filename="metadata")
+
+    data = Envelope()
+    data.content = message.as_bytes()
+    data.mail_from = "send@localhost.com"
+    data.rcpt_tos = ["dest@localhost.com"]
+    await receive(path, data)
+
+    # o assunto já existia e os anexos recebem o próximo nome livre, sem sobrescrever o conteúdo, os metadados ou outro anexo
+    subject = path.join("dest_localhost.com", "Test_Subject_2")
+    assert sorted(os.listdir(str(subject))) == ["content.txt", "content_2.txt", "content_2_2.txt", "metadata.json", "metadata_2.json"]
+    assert is_valid_email_in(subject)
+
+    with subject.join("content.txt").file() as content:
+        assert content.read().strip() == "test content"
+    with subject.join("content_2_2.txt").file() as attachment:
+        assert attachment.read().strip() == "second attachment"
+
+
+@pytest.mark.asyncio
+async def test__email__content_bytes__invalid_utf8(data_to_tests: Path):
+    path = data_to_tests.join("emails")
+    handler = await receive(path, raw_envelope(b"caf\xe9 \xff content"))
+
+    received = handler.emails[0]
+    assert received.content == "caf\ufffd \ufffd content"
+    assert received.content_bytes == received.content.encode("utf-8")
+
+    subject = path.join("dest_localhost.com", "Test_Subject")
+    assert is_valid_email_in(subject)
+    assert get_email_from(subject).content == received.content
+
+
+@pytest.mark.asyncio
+async def test__email__content__unknown_charset(data_to_tests: Path):
+    path = data_to_tests.join("emails")
+    body = "conteúdo de teste".encode("utf-8")
+    handler = await receive(path, raw_envelope(body, b"Content-Type: text/plain; charset=x-unknown\r\n"))
+
+    received = handler.emails[0]
+    assert received.content == "conteúdo de teste"
+    # a codificação registrada é a usada na decodificação, e os bytes recebidos são reaproveitados
+    assert received._content_charset == "utf-8"
+    assert received.content_bytes is received._content_bytes
+
+    subject = path.join("dest_localhost.com", "Test_Subject")
+    assert is_valid_email_in(subject)
+    assert get_email_from(subject).content == "conteúdo de teste"
+
+
+@pytest.mark.parametrize("headers, body", [
+    (b"Content-Type: text/plain; charset=iso-8859-1\r\nContent-Transfer-Encoding: 8bit\r\n", "olá, mundo\r\n".encode("iso-8859-1")),
+    (b"Content-Type: text/plain; charset=utf-8\r\nContent-Transfer-Encoding: quoted-printable\r\n", b"ol=C3=A1, =\r\nmundo=0A\r\n"),
+    (b"Content-Type: text/plain; charset=utf-8\r\nContent-Transfer-Encoding: base64\r\n", base64.encodebytes("olá, mundo\n".encode("utf-8"))),
+    (b"", b"  plain text body\r\n\r\n"),
+])
+def test__parse_body__single_part(headers: bytes, body: bytes):
+    data = raw_envelope(body, headers).content
+    expected = message_from_bytes(data)
+
+    # o caminho rápido (text/plain sem codificação de transferência) e o parser completo devolvem o mesmo resultado
+    assert _parse_body(data) == (expected.get_payload(decode=True).strip(), expected.get_content_charset(), {})
+
+
+@pytest.mark.parametrize("content", [
+    "test content",
+    "line 1\r\nline 2\n\nline 4",
+    "conteúdo de teste",
+    "x" * 78,
+    "x" * 79,
+    "long line " * 120,
+])
+def test__set_text_content(content: str):
+    fast, expected = EmailMessage(), EmailMessage()
+    for message in (fast, expected):
+        message["From"] = "send@localhost.com"
+        message["Subject"] = "Test Subject"
+
+    _set_text_content(fast, content)
+    expected.set_content(content)
+
+    assert fast.as_bytes() == expected.as_bytes()
+
+
+def test__header__encoded_words():
+    # cabeçalhos reaproveitados do cache continuam decodificando palavras codificadas (RFC 2047)
+    assert _header("Subject", "=?utf-8?q?caf=C3=A9?=") == "café"
+    assert _header("Subject", "=?utf-8?q?caf=C3=A9?=") is _header("Subject", "=?utf-8?q?caf=C3=A9?=")
+
+    for _ in range(2):
+        message = EmailMessage()
+        message["Subject"] = _header("Subject", "assunto com acentuação")
+        message.set_content("test content")
+
+        assert message_from_bytes(message.as_bytes(), policy=policy.default)["Subject"] == "assunto com acentuação"
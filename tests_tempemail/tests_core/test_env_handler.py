@@ -1,6 +1,11 @@
+import os
+import re
 import pytest
 
 from tempemail import EnvHandler, Path
+from tempemail.core.messeger import EMPTY_ENVFILE
+from tempemail.exceptions import EmptyEnvfileException
+from tempemail.core import env_handler as env_handler_module
 
 from tests_tempemail.conftest import configure_env
 
@@ -36,6 +41,17 @@ def test__env_handler__get_all_variables(test_env: Path):
     assert env_handler.TEST == "test"
 
 
+def test__env_handler__get_all_variables__equals_in_value(test_env: Path):
+    configure_env(test_env)
+    with test_env.file("a") as env:
+        env.write("TOKEN='abc=def=='\n")
+
+    env_handler = EnvHandler(test_env)
+    env_handler.get_all_variables()
+
+    assert env_handler.TOKEN == "abc=def=="
+
+
 def test__env_handler__load(env: EnvHandler, test_env: Path):
     assert env.SERVER == "localhost"
 
@@ -112,4 +128,103 @@ def test__env_handler__unique(env: EnvHandler, test_env: Path, data_to_tests: Pa
     other_env_unique = EnvHandler.unique(other_path)
 
     assert env == env_unique
-    assert other_env == other_env_unique
\ No newline at end of file
+    assert other_env == other_env_unique
+
+
+def test__env_handler__unique__without_envpath(env: EnvHandler, data_to_tests: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(EnvHandler, "__instance__", {})
+
+    with pytest.raises(EmptyEnvfileException):
+        EnvHandler.unique()
+
+    first = EnvHandler.unique(env._envpath)
+    other_path = data_to_tests.join("other.env")
+    gen_env(other_path)
+    EnvHandler(other_path)
+
+    # sem envpath, a primeira instância registrada é retornada
+    assert EnvHandler.unique() is first
+
+
+def test__env_handler__empty_envfile(env: EnvHandler, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(EnvHandler, "__instance__", {})
+
+    with pytest.raises(EmptyEnvfileException, match=re.escape(EMPTY_ENVFILE)):
+        EnvHandler.unique()
+
+    with pytest.raises(EmptyEnvfileException, match=re.escape(EMPTY_ENVFILE)):
+        EnvHandler._set_unique_instance(None, env)
+
+    assert EnvHandler.__instance__ == {}
+
+
+def count_writes(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    writes = []
+    def counting_open(file, mode="r", *args, **kwargs):
+        if "w" in mode:
+            writes.append(file)
+        return open(file, mode, *args, **kwargs)
+    monkeypatch.setattr(env_handler_module, "open", counting_open, raising=False)
+    return writes
+
+
+def test__env_handler__set_env__single_write(env: EnvHandler, test_env: Path, monkeypatch: pytest.MonkeyPatch):
+    with test_env.file("a") as file:
+        file.write("# comment\nOTHER=value # inline\n")
+
+    writes = count_writes(monkeypatch)
+    env.set_env(SERVER="test_server", PORT="5000", TEST="testing", BACKSLASH="C:\\path\\'quoted'")
+
+    assert len(writes) == 1
+    assert env.SERVER == "test_server"
+    assert env.TEST == "testing"
+    assert env.BACKSLASH == "C:\\path\\'quoted'"
+
+    with test_env.file() as file:
+        content = file.read().splitlines()
+    assert "# comment" in content
+    assert "OTHER=value # inline" in content
+
+
+def test__env_handler__set_env__unchanged(env: EnvHandler, test_env: Path, monkeypatch: pytest.MonkeyPatch):
+    with test_env.file() as file:
+        content = file.read()
+
+    writes = count_writes(monkeypatch)
+    env.set_env(SERVER="localhost", PORT="1025")
+
+    assert writes == []
+    with test_env.file() as file:
+        assert file.read() == content
+
+
+def test__env_handler__load__cache(env: EnvHandler, test_env: Path, monkeypatch: pytest.MonkeyPatch):
+    parses = []
+    dotenv_values = env_handler_module.dotenv.dotenv_values
+    def counting_values(*args, **kwargs):
+        parses.append(args)
+        return dotenv_values(*args, **kwargs)
+    monkeypatch.setattr(env_handler_module.dotenv, "dotenv_values", counting_values)
+
+    env.load()
+    env.load()
+    assert parses == []
+
+    # alteração feita fora de set_env
+    with test_env.file("a") as file:
+        file.write("SERVER='edited_server'\n")
+    env.load()
+
+    assert len(parses) == 1
+    assert env.SERVER == "edited_server"
+
+
+def test__env_handler__load__missing_file(env: EnvHandler, test_env: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SERVER", "process_server")
+    monkeypatch.setenv("PORT", "2525")
+    test_env.remove()
+
+    env.load()
+
+    assert env.SERVER == "process_server"
+    assert env.PORT == "2525"
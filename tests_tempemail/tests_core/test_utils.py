@@ -1,11 +1,14 @@
 import os
 import re
 import json
+import hashlib
+import pytest
 from io import TextIOWrapper
 
 from tempemail.core.utils import *
-from tempemail.core.utils import get_email_hash
-from tempemail.core.messeger import PATH_NOT_FOUND
+from tempemail.core.utils import get_email_hash, hash_file, _read_email, Report
+from tempemail.core.messeger import PATH_NOT_FOUND, ATTACHMENT_SPOOL_SIZE
+from tempemail.exceptions import PathExistsException, UnexpectedTypeException
 from tempemail import EmailHandler, EnvHandler, Email
 
 from tests_tempemail.conftest import compare, create_structure_path, configure_env
@@ -51,6 +54,13 @@ def test__get_email_hash(test_env: Path, data_to_tests: Path):
     assert get_email_hash(email) != email_hash
 
 
+def test__get_email_hash__field_boundary():
+    email1 = Email(destination="dest@localhost.com", sender="send@localhost.com", subject="ab", content="c", date="date")
+    email2 = Email(destination="dest@localhost.com", sender="send@localhost.com", subject="a", content="bc", date="date")
+
+    assert get_email_hash(email1) != get_email_hash(email2)
+
+
 def test__get_email_from(test_env: Path, data_to_tests: Path):
     configure_env(test_env)
 
@@ -75,6 +85,72 @@ def test__get_email_from(test_env: Path, data_to_tests: Path):
     assert email.rid == rec_email.rid
 
 
+def save_with_attachment(test_env: Path, data_to_tests: Path, payload: bytes) -> Path:
+    configure_env(test_env)
+
+    emails = data_to_tests.join("emails")
+    handler = EmailHandler(EnvHandler.unique(test_env))
+    handler.save_in(emails)
+
+    attachment = data_to_tests.join("document.pdf")
+    with attachment.file("wb", non_existent_ok=True) as file:
+        file.write(payload)
+
+    email = Email(
+        destination="dest@localhost.com",
+        sender="send@localhost.com",
+        subject="Test Subject",
+        content="test content.",
+        document=str(attachment)
+    )
+
+    with handler:
+        handler.send(email)
+
+    return emails.join("dest_localhost.com", "Test_Subject")
+
+
+def test__read_email__tampered_attachment(test_env: Path, data_to_tests: Path):
+    subject_path = save_with_attachment(test_env, data_to_tests, b"%PDF attachment")
+
+    assert _read_email(subject_path, load=False) is not None
+    assert bytes(get_email_from(subject_path).attachments["document.pdf"].payload) == b"%PDF attachment"
+
+    with subject_path.join("document.pdf").file("wb") as file:
+        file.write(b"%PDF tampered")
+
+    assert _read_email(subject_path, load=False) is None
+    assert _read_email(subject_path, load=True) is None
+    assert not is_valid_email_in(subject_path)
+
+
+def test__read_email__unlisted_file(test_env: Path, data_to_tests: Path):
+    subject_path = save_with_attachment(test_env, data_to_tests, b"%PDF attachment")
+
+    # arquivos que não constam nos metadados não são carregados como anexos
+    with subject_path.join("notes.txt").file("wb", non_existent_ok=True) as file:
+        file.write(b"not an attachment")
+
+    assert is_valid_email_in(subject_path)
+    assert list(get_email_from(subject_path).attachments) == ["document.pdf"]
+
+
+def test__read_email__large_attachment(test_env: Path, data_to_tests: Path):
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("requires /proc/self/fd")
+
+    payload = os.urandom(ATTACHMENT_SPOOL_SIZE + 1)
+    subject_path = save_with_attachment(test_env, data_to_tests, payload)
+
+    descriptors = len(os.listdir("/proc/self/fd"))
+    attachment = get_email_from(subject_path).attachments["document.pdf"]
+
+    # o mapeamento não mantém descritores abertos
+    assert len(os.listdir("/proc/self/fd")) == descriptors
+    assert bytes(attachment.payload) == payload
+    attachment.payload.close()
+
+
 def test__is_valid_email_in(test_env: Path, data_to_tests: Path):
     configure_env(test_env)
 
@@ -97,6 +173,41 @@ def test__is_valid_email_in(test_env: Path, data_to_tests: Path):
     assert is_valid_email_in(subject_path)
 
 
+def test__is_valid_email_in__legacy_hash(test_env: Path, data_to_tests: Path):
+    subject_path = save_with_attachment(test_env, data_to_tests, b"%PDF attachment")
+
+    metadata_path = subject_path.join("metadata.json")
+    with metadata_path.file() as meta:
+        metadata = json.load(meta)
+    with subject_path.join("content" + metadata["extension"]).file() as content:
+        fields = (metadata["subject"], content.read(), metadata["sender"], metadata["destination"], metadata["date"])
+
+    # formato anterior ao separador nulo: campos normalizados e concatenados diretamente
+    metadata["hash"] = hashlib.sha256("".join(str(field).strip().lower() for field in fields).encode()).hexdigest()
+    with metadata_path.file("w") as meta:
+        json.dump(metadata, meta)
+
+    assert is_valid_email_in(subject_path)
+    assert get_email_from(subject_path).subject == "Test Subject"
+
+    metadata["hash"] = hashlib.sha256(b"other fields").hexdigest()
+    with metadata_path.file("w") as meta:
+        json.dump(metadata, meta)
+
+    assert not is_valid_email_in(subject_path)
+
+
+def test__hash_file(data_to_tests: Path):
+    data_to_tests.mkdir(True)
+
+    content = os.urandom(200_000)
+    file_path = data_to_tests.join("attachment.bin")
+    with open(str(file_path), "wb") as file:
+        file.write(content)
+
+    assert hash_file(file_path, chunk_size=4096) == hashlib.sha256(content).hexdigest()
+
+
 def test__path():
     path = Path(".", "test", "testing")
 
@@ -199,6 +310,22 @@ def test__path__items(data_to_tests: Path):
         assert item.is_type(typ)
 
 
+def test__path__items__ignore(data_to_tests: Path):
+    create_structure_path(data_to_tests)
+    main = data_to_tests.join("example_structure_path")
+
+    names = ["directory1", "directory2", "file1.txt", "file2.txt"]
+    assert sorted(item.name for item in main.items()) == names
+    assert sorted(item.name for item in main.items(None)) == names
+    assert sorted(item.name for item in main.items(ignore=["directory1", "file2.txt"])) == ["directory2", "file1.txt"]
+
+    for item in main.items():
+        assert str(item) == str(main.join(item.name))
+
+    with pytest.raises(UnexpectedTypeException):
+        main.items(ignore="file1.txt")
+
+
 def test__path__mkdir(data_to_tests: Path):
     directory = data_to_tests.join("directory")
     subdirectory = directory.join("subdirectory")
@@ -212,6 +339,19 @@ def test__path__mkdir(data_to_tests: Path):
     assert subdirectory.exists
 
 
+def test__path__mkdir__exists(data_to_tests: Path):
+    subdirectory = data_to_tests.join("directory", "subdirectory")
+
+    subdirectory.mkdir()
+    assert subdirectory.is_type("directory")
+
+    with pytest.raises(PathExistsException):
+        subdirectory.mkdir(exists_ok=False)
+
+    subdirectory.mkdir(exists_ok=True)
+    assert subdirectory.exists
+
+
 def test__path__free_name(data_to_tests: Path):
     path_directory = data_to_tests.join("directory")
     path_directory.mkdir(True)
@@ -227,6 +367,11 @@ def test__path__free_name(data_to_tests: Path):
 
     assert free_name_file.name == "file_2.txt"
 
+    for _ in range(10):
+        data_to_tests.free_name("file.txt").file(mode="w", non_existent_ok=True).close()
+
+    assert data_to_tests.free_name("file.txt").name == "file_12.txt"
+
 
 def test__path__is_type(data_to_tests: Path):
     directory = data_to_tests.join("directory")
@@ -293,3 +438,11 @@ def test__path__rename(data_to_tests: Path):
 
 def test__path__name(data_to_tests: Path):
     assert data_to_tests.name == "data_to_tests"
+
+
+def test__report__error():
+    report = Report("200 OK")
+    report.error.append(Email(destination="dest@localhost.com"))
+
+    assert len(report) == 1
+    assert len(Report("250 FULL-SUCCESSFUL")) == 0